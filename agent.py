@@ -1,16 +1,67 @@
 import os
-from typing import List, Dict, Any
+import re
+import time
+import queue
+import asyncio
+import threading
+from typing import List, Dict, Any, Iterator
 from langchain.agents import AgentExecutor, create_openai_tools_agent
 from langchain_openai import ChatOpenAI
 from langchain_ollama import ChatOllama
 from langchain.prompts import ChatPromptTemplate, MessagesPlaceholder
 from langchain.schema import SystemMessage, HumanMessage
 from langchain.tools import BaseTool
+from langchain_core.callbacks import BaseCallbackHandler
 from chatbortai.tools import FileSearchTool, FileReaderTool, ASTParserTool, DirectoryListerTool
 from chatbortai.vector_store import CodeVectorStore
 from chatbortai.config import Config
 from chatbortai.demo_llm import DemoLLM
 from chatbortai.demo_agent import DemoAgent
+from chatbortai.repository import RepositoryIdentity, vector_store_cache
+from chatbortai.embeddings import embedding_models
+from chatbortai.query_cache import query_cache
+from chatbortai.file_watcher import RepositoryWatcher, watchdog_available
+
+class StreamingEventHandler(BaseCallbackHandler):
+    """Forwards answer tokens and tool calls of an agent run to a queue as event dicts"""
+    
+    def __init__(self, events: queue.Queue):
+        self.events = events
+    
+    def on_llm_new_token(self, token: str, **kwargs: Any):
+        if token:
+            self.events.put({"type": "token", "content": token})
+    
+    def on_tool_start(self, serialized: Dict[str, Any], input_str: str, **kwargs: Any):
+        self.events.put({"type": "tool_start", "tool": (serialized or {}).get("name", "tool"), "input": input_str})
+    
+    def on_tool_end(self, output: Any, **kwargs: Any):
+        self.events.put({"type": "tool_end", "tool": kwargs.get("name", "tool"), "output": str(output)})
+
+class ToolLatencyHandler(BaseCallbackHandler):
+    """Records the wall-clock latency of each tool call of an agent run"""
+    
+    run_inline = True  # Time calls where they happen, not from a callback executor
+    
+    def __init__(self):
+        self.calls = []
+        self._started = {}
+    
+    def on_tool_start(self, serialized: Dict[str, Any], input_str: str, *, run_id, **kwargs: Any):
+        self._started[run_id] = ((serialized or {}).get("name", "tool"), input_str, time.perf_counter())
+    
+    def on_tool_end(self, output: Any, *, run_id, **kwargs: Any):
+        self._finish(run_id, "ok")
+    
+    def on_tool_error(self, error: BaseException, *, run_id, **kwargs: Any):
+        self._finish(run_id, "error")
+    
+    def _finish(self, run_id, status: str):
+        started = self._started.pop(run_id, None)
+        if started is not None:
+            tool, tool_input, start_time = started
+            self.calls.append({"tool": tool, "input": tool_input, "status": status,
+                               "seconds": time.perf_counter() - start_time})
 
 class CodePalAgent:
     """Main agent class for CodePal chatbot"""
@@ -21,6 +72,7 @@ class CodePalAgent:
         self.agent = None
         self.agent_executor = None
         self.tools = []
+        self.demo_agent = None
         
         # Initialize LLM
         self._initialize_llm()
@@ -38,6 +90,7 @@ class CodePalAgent:
             self.llm = DemoLLM()
         elif Config.LLM_PROVIDER.lower() == "ollama":
             # Initialize Ollama
+            # ChatOllama always streams from the server and reports tokens to callbacks
             self.llm = ChatOllama(
                 model=Config.OLLAMA_MODEL,
                 base_url=Config.OLLAMA_BASE_URL,
@@ -51,23 +104,24 @@ class CodePalAgent:
             self.llm = ChatOpenAI(
                 model=Config.LLM_MODEL,
                 temperature=0.1,
-                api_key=Config.OPENAI_API_KEY
+                api_key=Config.OPENAI_API_KEY,
+                streaming=True
             )
     
     def _initialize_tools(self):
         """Initialize all tools"""
         # File search tool
         if self.vector_store:
-            self.tools.append(FileSearchTool(self.vector_store, self.vector_store.embedding_model))
+            self.tools.append(FileSearchTool(self.vector_store))
         
         # File reader tool
-        self.tools.append(FileReaderTool())
+        self.tools.append(FileReaderTool(self.vector_store))
         
         # AST parser tool
-        self.tools.append(ASTParserTool())
+        self.tools.append(ASTParserTool(self.vector_store))
         
         # Directory lister tool
-        self.tools.append(DirectoryListerTool())
+        self.tools.append(DirectoryListerTool(self.vector_store.directory_tree if self.vector_store else None))
     
     def _initialize_agent(self):
         """Initialize the agent with tools and prompt"""
@@ -115,6 +169,12 @@ Current working directory: {working_directory}"""
             max_iterations=5
         )
     
+    def _get_demo_agent(self) -> DemoAgent:
+        """The demo agent, created once so its tools and answer cache persist across questions"""
+        if self.demo_agent is None:
+            self.demo_agent = DemoAgent(self.vector_store)
+        return self.demo_agent
+    
     def ask(self, question: str, chat_history: List = None) -> str:
         """Ask a question and get a response"""
         if chat_history is None:
@@ -124,8 +184,7 @@ Current working directory: {working_directory}"""
             # Check if we're using demo mode
             if Config.LLM_PROVIDER.lower() == "demo":
                 # Use the demo agent directly
-                demo_agent = DemoAgent(self.vector_store)
-                return demo_agent.ask(question, chat_history)
+                return self._get_demo_agent().ask(question, chat_history)
             
             # Get current working directory
             working_directory = os.getcwd()
@@ -145,9 +204,92 @@ Current working directory: {working_directory}"""
         except Exception as e:
             return f"I encountered an error while processing your question: {str(e)}"
     
+    async def aask(self, question: str, chat_history: List = None) -> Dict[str, Any]:
+        """Ask a question asynchronously; tool calls the model issues together run concurrently.
+        
+        Returns {"output": answer, "tool_calls": [{"tool", "input", "status", "seconds"}], "seconds": total}.
+        """
+        if chat_history is None:
+            chat_history = []
+        
+        start_time = time.perf_counter()
+        latency = ToolLatencyHandler()
+        try:
+            if Config.LLM_PROVIDER.lower() == "demo":
+                output = await asyncio.to_thread(self._get_demo_agent().ask, question, chat_history)
+            else:
+                agent_input = {
+                    "input": question,
+                    "chat_history": chat_history,
+                    "working_directory": os.getcwd()
+                }
+                result = await self.agent_executor.ainvoke(agent_input, config={"callbacks": [latency]})
+                output = result.get("output", "I couldn't process your request.")
+        except Exception as e:
+            output = f"I encountered an error while processing your question: {str(e)}"
+        
+        return {"output": output, "tool_calls": latency.calls, "seconds": time.perf_counter() - start_time}
+    
+    def stream(self, question: str, chat_history: List = None) -> Iterator[Dict[str, Any]]:
+        """Answer a question as a stream of events while the agent runs.
+        
+        Yields {"type": "token", "content"} for answer text as the LLM produces it and
+        {"type": "tool_start", "tool", "input"} / {"type": "tool_end", "tool", "output"}
+        around tool calls.
+        """
+        if chat_history is None:
+            chat_history = []
+        
+        if Config.LLM_PROVIDER.lower() == "demo":
+            # The demo agent answers in one piece; stream it word by word
+            answer = self._get_demo_agent().ask(question, chat_history)
+            for piece in re.findall(r"\s*\S+\s*", answer):
+                yield {"type": "token", "content": piece}
+            return
+        
+        agent_input = {
+            "input": question,
+            "chat_history": chat_history,
+            "working_directory": os.getcwd()
+        }
+        
+        # The executor runs in a worker thread and reports through the queue
+        events = queue.Queue()
+        done = object()
+        
+        def run():
+            try:
+                result = self.agent_executor.invoke(
+                    agent_input, config={"callbacks": [StreamingEventHandler(events)]}
+                )
+                events.put({"type": "final", "content": result.get("output", "I couldn't process your request.")})
+            except Exception as e:
+                events.put({"type": "token", "content": f"I encountered an error while processing your question: {str(e)}"})
+            finally:
+                events.put(done)
+        
+        threading.Thread(target=run, daemon=True).start()
+        
+        streamed_answer = False
+        while True:
+            event = events.get()
+            if event is done:
+                break
+            if event["type"] == "tool_end":
+                streamed_answer = False
+            elif event["type"] == "token":
+                streamed_answer = True
+            elif event["type"] == "final":
+                # Models that did not stream the last turn still deliver the answer, in one piece
+                if not streamed_answer:
+                    yield {"type": "token", "content": event["content"]}
+                continue
+            yield event
+    
     def update_vector_store(self, vector_store: CodeVectorStore):
         """Update the vector store and reinitialize tools"""
         self.vector_store = vector_store
+        self.demo_agent = None
         self.tools = []
         self._initialize_tools()
         self._initialize_agent()
@@ -163,46 +305,102 @@ class CodePalManager:
         self.vector_store = None
         self.agent = None
         self.processor = None
+        self.repository = None
+        self.watcher = None
     
-    def initialize_repository(self, repo_path: str, force_reprocess: bool = False) -> str:
-        """Initialize a repository for analysis"""
+    def initialize_repository(self, repo_path: str, force_reprocess: bool = False, persist: bool = True) -> str:
+        """Initialize a repository for analysis.
+        
+        persist=False indexes in memory only, for uploads extracted to temporary directories
+        that would otherwise each leave a namespace behind on disk.
+        """
+        # A watcher follows the previously loaded repository
+        self.stop_watching()
         try:
-            # Check if vector store already exists
-            vector_store_path = os.path.join(Config.VECTOR_STORE_PATH, "code_vectors")
+            # Each repository gets its own namespace on disk and in the LRU
+            identity = RepositoryIdentity(repo_path)
+            vector_store_path = identity.vector_store_path
             
-            if not force_reprocess and os.path.exists(vector_store_path):
-                # Try to load existing vector store
-                self.vector_store = CodeVectorStore()
-                if self.vector_store.load(vector_store_path):
-                    self.agent = CodePalAgent(self.vector_store)
-                    return f"Loaded existing vector store for repository: {repo_path}"
-            
-            # Process repository
             from chatbortai.vector_store import CodeProcessor
             self.processor = CodeProcessor()
             
-            # Process files
-            documents = self.processor.process_repository(repo_path)
-            
-            if not documents:
-                return f"No supported files found in repository: {repo_path}"
-            
-            # Create vector store
-            self.vector_store = CodeVectorStore()
-            self.vector_store.add_documents(documents)
-            self.vector_store.create_embeddings()
+            with vector_store_cache.lock_for(identity.key):
+                # Reuse a loaded or saved vector store unless a full rebuild was requested
+                vector_store = None if force_reprocess or not persist else vector_store_cache.get(identity.key)
+                loaded = vector_store is not None
+                if vector_store is None:
+                    vector_store = CodeVectorStore()
+                    loaded = persist and not force_reprocess and vector_store.load(vector_store_path)
+                
+                # Only re-chunk and re-embed files that changed since the last run
+                report = vector_store.refresh(identity.repo_path, self.processor)
+                
+                if vector_store.document_count == 0:
+                    return f"No supported files found in repository: {repo_path}"
+                
+                if persist:
+                    # Save vector store if anything changed
+                    if not loaded or report['updated'] or report['added'] or report['removed'] or report['backfilled']:
+                        vector_store.save(vector_store_path)
+                    identity.save(vector_store_path)
+                    
+                    vector_store_cache.put(identity.key, vector_store)
             
-            # Save vector store
-            self.vector_store.save(vector_store_path)
+            self.vector_store = vector_store
+            self.repository = identity
             
             # Initialize agent
             self.agent = CodePalAgent(self.vector_store)
             
-            return f"Successfully processed {len(documents)} documents from repository: {repo_path}"
+            summary = (f"{report['skipped']} unchanged, {report['updated']} updated, "
+                       f"{report['added']} added, {report['removed']} removed files")
+            stats = self.vector_store.ingest_stats
+            if stats.get('chunks'):
+                summary += (f"; embedded {stats['chunks']} chunks at {stats['chunks_per_sec']:.1f} chunks/s, "
+                            f"{stats['tokens_per_sec']:.0f} tokens/s")
+            if loaded:
+                return f"Loaded existing vector store for repository: {identity} ({summary})"
+            return f"Successfully processed {self.vector_store.document_count} documents from repository: {identity} ({summary})"
             
         except Exception as e:
             return f"Error initializing repository: {str(e)}"
     
+    @property
+    def is_watching(self) -> bool:
+        return self.watcher is not None and self.watcher.is_running
+    
+    def start_watching(self) -> str:
+        """Apply file changes in the loaded repository to its index as they happen"""
+        if not self.vector_store or not self.repository:
+            return "Please initialize a repository first before watching it."
+        if not watchdog_available():
+            return "File watching requires the watchdog package (pip install watchdog)."
+        
+        self.stop_watching()
+        # Bound now: a batch delivered while another repository is being loaded must not touch its store
+        identity = self.repository
+        vector_store = self.vector_store
+        processor = self.processor
+        
+        def apply_changes(paths):
+            # Never mistake a vanished repository (e.g. an unmounted drive) for deleted files
+            if not os.path.isdir(identity.repo_path):
+                return
+            with vector_store_cache.lock_for(identity.key):
+                report = vector_store.refresh(identity.repo_path, processor, paths)
+            if report['updated'] or report['added'] or report['removed']:
+                print(f"Index updated from file changes in {identity}: {report['updated']} updated, "
+                      f"{report['added']} added, {report['removed']} removed files")
+        
+        self.watcher = RepositoryWatcher(identity.repo_path, apply_changes)
+        self.watcher.start()
+        return f"Watching {identity} for file changes"
+    
+    def stop_watching(self):
+        if self.watcher is not None:
+            self.watcher.stop()
+            self.watcher = None
+    
     def ask_question(self, question: str, chat_history: List = None) -> str:
         """Ask a question to the agent"""
         if not self.agent:
@@ -210,6 +408,22 @@ class CodePalManager:
         
         return self.agent.ask(question, chat_history)
     
+    async def aask_question(self, question: str, chat_history: List = None) -> Dict[str, Any]:
+        """Ask a question to the agent asynchronously, with per-tool latency in the result"""
+        if not self.agent:
+            return {"output": "Please initialize a repository first before asking questions.",
+                    "tool_calls": [], "seconds": 0.0}
+        
+        return await self.agent.aask(question, chat_history)
+    
+    def stream_question(self, question: str, chat_history: List = None) -> Iterator[Dict[str, Any]]:
+        """Ask a question to the agent, streaming tool events and answer tokens"""
+        if not self.agent:
+            yield {"type": "token", "content": "Please initialize a repository first before asking questions."}
+            return
+        
+        yield from self.agent.stream(question, chat_history)
+    
     def get_repository_info(self) -> Dict[str, Any]:
         """Get information about the current repository"""
         if not self.vector_store:
@@ -217,6 +431,10 @@ class CodePalManager:
         
         return {
             "status": "Repository loaded",
-            "total_documents": len(self.vector_store.documents),
+            "repository": str(self.repository) if self.repository else None,
+            "total_documents": self.vector_store.document_count,
+            "embedding_models": embedding_models.metrics(),
+            "query_cache": query_cache.stats(),
+            "watching": self.is_watching,
             "available_tools": self.agent.get_available_tools() if self.agent else []
         } 
\ No newline at end of file
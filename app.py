@@ -5,6 +5,7 @@ import zipfile
 from pathlib import Path
 from chatbortai.agent import CodePalManager
 from chatbortai.config import Config
+from chatbortai.file_watcher import watchdog_available
 import time
 
 # Page configuration
@@ -90,7 +91,11 @@ def handle_repository_initialization(repo_path, input_method="Local Path"):
             time.sleep(0.5)
             
             # Initialize repository
-            result = st.session_state.code_pal_manager.initialize_repository(repo_path)
+            # Uploads live in temporary directories: index them in memory only
+            result = st.session_state.code_pal_manager.initialize_repository(
+                repo_path,
+                persist=input_method == "Local Path"
+            )
             
             progress_bar.progress(100)
             status_text.text("Repository loaded successfully!")
@@ -103,6 +108,8 @@ def handle_repository_initialization(repo_path, input_method="Local Path"):
             st.success("✅ Repository loaded successfully!")
             st.session_state.repository_loaded = True
             st.session_state.last_repo_path = repo_path
+            # Uploads are extracted to temporary directories that are gone after processing
+            st.session_state.watchable = input_method == "Local Path"
             
     except Exception as e:
         error_msg = str(e)
@@ -250,11 +257,26 @@ def main():
                     if last_repo_path:
                         result = st.session_state.code_pal_manager.initialize_repository(
                             last_repo_path,
-                            force_reprocess=True
+                            force_reprocess=True,
+                            persist=st.session_state.get('watchable', False)
                         )
                         st.success(result)
                     else:
                         st.error("No repository path available for reprocessing.")
+        
+        # Live index updates while files are edited
+        if st.session_state.repository_loaded and st.session_state.get('watchable'):
+            watch_files = st.toggle(
+                "👀 Watch for file changes",
+                value=Config.WATCH_FILES and watchdog_available(),
+                disabled=not watchdog_available(),
+                help="Re-index files as they are saved (requires watchdog)"
+            )
+            manager = st.session_state.code_pal_manager
+            if watch_files and not manager.is_watching:
+                st.info(manager.start_watching())
+            elif not watch_files and manager.is_watching:
+                manager.stop_watching()
     
     # Main content area
     if not st.session_state.repository_loaded:
@@ -324,12 +346,26 @@ def main():
             # Add user message to chat history
             st.session_state.chat_history.append({"role": "user", "content": user_question})
             
-            # Get response from agent
-            with st.spinner("CodePal is thinking..."):
-                response = st.session_state.code_pal_manager.ask_question(
-                    user_question, 
-                    st.session_state.chat_history
-                )
+            # Stream the response as it is generated; the history below shows it once complete
+            live_response = st.empty()
+            with live_response.container():
+                st.markdown("**🤖 CodePal:**")
+                tool_status = st.status("CodePal is thinking...", expanded=False)
+                
+                def answer_tokens():
+                    for event in st.session_state.code_pal_manager.stream_question(
+                        user_question,
+                        st.session_state.chat_history
+                    ):
+                        if event["type"] == "tool_start":
+                            tool_status.update(label=f"🔧 Using {event['tool']}...")
+                            tool_status.write(f"🔧 **{event['tool']}**: `{event['input']}`")
+                        elif event["type"] == "token":
+                            yield event["content"]
+                
+                response = st.write_stream(answer_tokens())
+                tool_status.update(label="✅ Done", state="complete")
+            live_response.empty()
             
             # Add assistant response to chat history
             st.session_state.chat_history.append({"role": "assistant", "content": response})
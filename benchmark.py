@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+"""
+Benchmark script for CodePal ingestion and retrieval.
+Measures embedding throughput with different worker counts, and recall@k vs
+latency of the approximate FAISS index types against the exact flat index.
+"""
+
+import os
+import sys
+import argparse
+import numpy as np
+from chatbortai.config import Config
+from chatbortai.vector_store import CodeVectorStore, CodeProcessor
+from chatbortai.index_factory import INDEX_TYPES, evaluate_index_types
+
+def print_header(title):
+    """Print a formatted header"""
+    print("\n" + "=" * 60)
+    print(f"⏱️ {title}")
+    print("=" * 60)
+
+def benchmark_embedding(repo_path, worker_counts, batch_size):
+    """Embed the same chunks once per worker count and report the speedup"""
+    print_header(f"Embedding benchmark: {repo_path}")
+
+    documents = CodeProcessor().process_repository(repo_path)
+    if not documents:
+        print(f"❌ No supported files found in repository: {repo_path}")
+        return None
+    print(f"📄 {len(documents)} chunks, batch size {batch_size}, {os.cpu_count()} CPU cores")
+
+    results = []
+    for workers in worker_counts:
+        vector_store = CodeVectorStore()
+        stats = vector_store.add_document_stream(iter(documents), batch_size=batch_size, workers=workers)
+        results.append((workers, stats))
+
+    baseline = results[0][1]['seconds']
+    print(f"\n{'workers':>8} {'seconds':>10} {'chunks/s':>10} {'tokens/s':>10} {'speedup':>8}")
+    for _, stats in results:
+        speedup = baseline / stats['seconds'] if stats['seconds'] > 0 else 0.0
+        # Workers actually used: a pool that failed to start falls back to a serial run
+        print(f"{stats['workers']:>8} {stats['seconds']:>10.1f} {stats['chunks_per_sec']:>10.1f} "
+              f"{stats['tokens_per_sec']:>10.0f} {speedup:>7.2f}x")
+
+    return results
+
+def benchmark_index(repo_path, index_types, num_queries, k, batch_size):
+    """Compare recall@k and query latency of each index type on the repository's chunks"""
+    print_header(f"Index benchmark: {repo_path}")
+
+    documents = CodeProcessor().process_repository(repo_path)
+    if not documents:
+        print(f"❌ No supported files found in repository: {repo_path}")
+        return None
+
+    embedding_model = CodeVectorStore().embedding_model
+    embeddings = np.vstack([
+        embedding_model.encode([doc.page_content for doc in documents[start:start + batch_size]])
+        for start in range(0, len(documents), batch_size)
+    ]).astype('float32')
+
+    # Use a sample of the chunks themselves as queries
+    rng = np.random.default_rng(0)
+    query_ids = rng.choice(len(embeddings), size=min(num_queries, len(embeddings)), replace=False)
+    queries = embeddings[query_ids]
+    print(f"📄 {len(embeddings)} vectors, {len(queries)} queries, k={k}, "
+          f"nprobe={Config.FAISS_NPROBE}, efSearch={Config.FAISS_EF_SEARCH}")
+
+    results = evaluate_index_types(embeddings, queries, k=k, index_types=index_types)
+
+    print(f"\n{'index':>10} {'recall@' + str(k):>10} {'ms/query':>10} {'build s':>10}")
+    for row in results:
+        print(f"{row['index_type']:>10} {row['recall']:>10.3f} {row['query_ms']:>10.3f} {row['build_seconds']:>10.1f}")
+
+    return results
+
+def main():
+    """Main function"""
+    parser = argparse.ArgumentParser(description="Benchmark CodePal ingestion")
+    parser.add_argument("repo_path", help="Repository to ingest")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, os.cpu_count() or 1],
+                        help="Worker counts to compare (first one is the baseline)")
+    parser.add_argument("--batch-size", type=int, default=Config.EMBEDDING_BATCH_SIZE)
+    parser.add_argument("--index-types", nargs="*", choices=INDEX_TYPES,
+                        help="Also compare recall@k and latency of these FAISS index types")
+    parser.add_argument("--queries", type=int, default=200, help="Queries used for the index benchmark")
+    parser.add_argument("-k", type=int, default=10, help="Neighbours per query for recall@k")
+    args = parser.parse_args()
+
+    if not os.path.exists(args.repo_path):
+        print(f"❌ Repository not found at: {args.repo_path}")
+        sys.exit(1)
+
+    benchmark_embedding(args.repo_path, args.workers, args.batch_size)
+
+    if args.index_types is not None:
+        benchmark_index(args.repo_path, args.index_types or list(INDEX_TYPES), args.queries, args.k, args.batch_size)
+
+if __name__ == "__main__":
+    main()
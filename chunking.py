@@ -0,0 +1,127 @@
+import re
+import ast
+import bisect
+from typing import List, Tuple, Optional
+
+_DEFINITIONS = (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)
+
+_TOKEN_PATTERN = re.compile(r"\w+|[^\w\s]")
+
+def approximate_token_count(text: str) -> int:
+    """Cheap token estimate (words and punctuation) for throughput reporting and context budgets"""
+    return len(_TOKEN_PATTERN.findall(text))
+
+def _span_length(lines: List[str], start: int, end: int) -> int:
+    return sum(len(line) for line in lines[start - 1:end])
+
+def _leading_comments_start(lines: List[str], start: int, floor: int) -> int:
+    """Move a definition's start up over the comment lines directly above it"""
+    while start - 1 >= floor and lines[start - 2].lstrip().startswith('#'):
+        start -= 1
+    return start
+
+def _definition_spans(body: List[ast.stmt], start: int, end: int, lines: List[str],
+                      chunk_size: int) -> List[Tuple[int, int]]:
+    """1-based inclusive line spans: one per definition, plus the code between definitions.
+
+    Classes too large for one chunk are opened up so each method gets its own span and
+    the class header (signature, docstring, attributes) forms another.
+    """
+    spans = []
+    cursor = start
+    for node in body:
+        if not isinstance(node, _DEFINITIONS):
+            continue
+
+        node_start = min([node.lineno] + [decorator.lineno for decorator in node.decorator_list])
+        node_start = _leading_comments_start(lines, node_start, cursor)
+        if node_start > cursor:
+            spans.append((cursor, node_start - 1))
+
+        if isinstance(node, ast.ClassDef) and _span_length(lines, node_start, node.end_lineno) > chunk_size:
+            spans.extend(_definition_spans(node.body, node_start, node.end_lineno, lines, chunk_size))
+        else:
+            spans.append((node_start, node.end_lineno))
+        cursor = node.end_lineno + 1
+
+    if cursor <= end:
+        spans.append((cursor, end))
+    return spans
+
+def _split_span(lines: List[str], start: int, end: int, chunk_size: int) -> List[Tuple[str, int, int]]:
+    """Cut an oversized span on line boundaries, without overlap"""
+    chunks = []
+    chunk_start = start
+    text = ""
+    for line_no in range(start, end + 1):
+        line = lines[line_no - 1]
+        if text and len(text) + len(line) > chunk_size:
+            chunks.append((text, chunk_start, line_no - 1))
+            chunk_start, text = line_no, ""
+
+        if len(line) > chunk_size:
+            # A single huge line (minified code, data) is cut on characters
+            for offset in range(0, len(line), chunk_size):
+                chunks.append((line[offset:offset + chunk_size], line_no, line_no))
+            chunk_start = line_no + 1
+            continue
+        text += line
+
+    if text:
+        chunks.append((text, chunk_start, end))
+    return chunks
+
+def chunk_python_source(content: str, chunk_size: int) -> Optional[List[Tuple[str, int, int]]]:
+    """Split Python source into (text, start_line, end_line) chunks along definitions.
+
+    Each top-level function and class becomes one chunk (methods of oversized classes get
+    their own), module code between definitions is grouped, and only spans longer than
+    chunk_size are cut further. Returns None if the source does not parse.
+    """
+    try:
+        tree = ast.parse(content)
+    except (SyntaxError, ValueError):
+        return None
+
+    lines = content.splitlines(keepends=True)
+    chunks = []
+    for start, end in _definition_spans(tree.body, 1, len(lines), lines, chunk_size):
+        if _span_length(lines, start, end) > chunk_size:
+            pieces = _split_span(lines, start, end, chunk_size)
+        else:
+            pieces = [(''.join(lines[start - 1:end]), start, end)]
+        for text, first, last in pieces:
+            if not text.strip():
+                continue
+            # Report the lines that actually hold code, not surrounding blank lines
+            body = text.rstrip().lstrip('\n')
+            first += len(text) - len(text.lstrip('\n'))
+            chunks.append((body, first, min(last, first + body.count('\n'))))
+    return chunks
+
+def locate_chunks(content: str, chunks: List[str]) -> List[Tuple[int, int, int, int]]:
+    """(start_line, end_line, start_byte, end_byte) of each chunk, found in order in content.
+
+    Chunks may overlap but must appear in content in the order given; byte offsets are into
+    the UTF-8 encoding of content. Chunks that cannot be found get -1 everywhere.
+    """
+    line_starts = [0] + [i + 1 for i, char in enumerate(content) if char == '\n']
+    positions = []
+    search_from = 0
+    char_pos = byte_pos = 0  # start of the last located chunk, in characters and bytes
+    for chunk in chunks:
+        index = content.find(chunk, search_from)
+        if index < 0:
+            positions.append((-1, -1, -1, -1))
+            continue
+
+        byte_pos += len(content[char_pos:index].encode('utf-8'))
+        char_pos = index
+        search_from = index + 1
+        positions.append((
+            bisect.bisect_right(line_starts, index),
+            bisect.bisect_right(line_starts, index + max(len(chunk) - 1, 0)),
+            byte_pos,
+            byte_pos + len(chunk.encode('utf-8'))
+        ))
+    return positions
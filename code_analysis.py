@@ -1,53 +1,153 @@
 import ast
 import os
-from typing import List, Dict, Optional
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from typing import List, Dict, Optional, Any
+from chatbortai.config import Config
+
+# Parse results keyed on (path, mtime, size); entries for edited files simply stop matching
+_ANALYSIS_CACHE_SIZE = 2048
+_analysis_cache = OrderedDict()
+_analysis_cache_lock = threading.Lock()
+
+def _signature(node) -> str:
+    """Source-like signature of a function or class definition."""
+    if isinstance(node, ast.ClassDef):
+        bases = [ast.unparse(base) for base in node.bases] + [ast.unparse(kw) for kw in node.keywords]
+        return f"class {node.name}({', '.join(bases)})" if bases else f"class {node.name}"
+
+    prefix = "async def" if isinstance(node, ast.AsyncFunctionDef) else "def"
+    signature = f"{prefix} {node.name}({ast.unparse(node.args)})"
+    if node.returns is not None:
+        signature += f" -> {ast.unparse(node.returns)}"
+    return signature
+
+def _first_comment(source: str) -> Optional[str]:
+    for line in source.splitlines():
+        if line.strip().startswith('#'):
+            return line.strip('#').strip()
+    return None
+
+def analyze_source(source: str, file_path: str = "<unknown>") -> Dict[str, Any]:
+    """Parse Python source once and collect functions, classes, imports and the module docstring.
+
+    Functions include async functions and methods; every definition carries its qualified
+    name, line span, signature, docstring, parent class and decorators.
+    """
+    tree = ast.parse(source, filename=file_path)
+    functions = []
+    classes = []
+    imports = []
+
+    def visit(node, scope: List[str], parent_class: Optional[str]):
+        for child in ast.iter_child_nodes(node):
+            if isinstance(child, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+                is_class = isinstance(child, ast.ClassDef)
+                info = {
+                    'name': child.name,
+                    'qualified_name': '.'.join(scope + [child.name]),
+                    'lineno': child.lineno,
+                    'end_lineno': child.end_lineno,
+                    'docstring': ast.get_docstring(child),
+                    'signature': _signature(child),
+                    'parent_class': parent_class,
+                    'decorators': [ast.unparse(decorator) for decorator in child.decorator_list],
+                    'is_async': isinstance(child, ast.AsyncFunctionDef)
+                }
+                (classes if is_class else functions).append(info)
+                visit(child, scope + [child.name], child.name if is_class else None)
+            else:
+                if isinstance(child, ast.Import):
+                    imports.extend(alias.name for alias in child.names)
+                elif isinstance(child, ast.ImportFrom):
+                    module = child.module or ""
+                    imports.extend(f"{module}.{alias.name}" for alias in child.names)
+                visit(child, scope, parent_class)
+
+    visit(tree, [], None)
+    return {
+        'file_path': file_path,
+        'module_docstring': ast.get_docstring(tree),
+        'first_comment': _first_comment(source),
+        'functions': functions,
+        'classes': classes,
+        'imports': imports
+    }
+
+def analyze_file(file_path: str) -> Dict[str, Any]:
+    """Analyze a Python file with a single parse, reusing the result while the file is unchanged.
+
+    The returned dict is shared with the cache and must not be modified.
+    """
+    stat_result = os.stat(file_path)
+    key = (os.path.realpath(file_path), stat_result.st_mtime_ns, stat_result.st_size)
+    with _analysis_cache_lock:
+        analysis = _analysis_cache.get(key)
+        if analysis is not None:
+            _analysis_cache.move_to_end(key)
+            return analysis
+
+    with open(file_path, 'r', encoding='utf-8') as f:
+        analysis = analyze_source(f.read(), file_path)
+
+    with _analysis_cache_lock:
+        _analysis_cache[key] = analysis
+        while len(_analysis_cache) > _ANALYSIS_CACHE_SIZE:
+            _analysis_cache.popitem(last=False)
+    return analysis
+
+def _analyze_file_or_none(file_path: str) -> Optional[Dict[str, Any]]:
+    try:
+        return analyze_file(file_path)
+    except (SyntaxError, ValueError, OSError):
+        return None
+
+def analyze_directory(directory: str, workers: int = None) -> Dict[str, Dict[str, Any]]:
+    """Analyze all Python files in a directory in parallel; files that fail to parse are skipped."""
+    files = list_python_files(directory)
+    workers = workers or Config.INGEST_WORKERS
+    if workers <= 1 or len(files) <= 1:
+        results = map(_analyze_file_or_none, files)
+        return {path: analysis for path, analysis in zip(files, results) if analysis is not None}
+
+    # Parsing holds the GIL, so a process pool is what actually spreads it over cores
+    executor_class = ProcessPoolExecutor if Config.INGEST_EXECUTOR == "process" else ThreadPoolExecutor
+    with executor_class(workers) as executor:
+        results = list(executor.map(_analyze_file_or_none, files, chunksize=16))
+
+    analyses = {}
+    for path, analysis in zip(files, results):
+        if analysis is None:
+            continue
+        analyses[path] = analysis
+        if executor_class is ProcessPoolExecutor:
+            # Results parsed in workers still warm this process's cache
+            stat_result = os.stat(path)
+            with _analysis_cache_lock:
+                _analysis_cache[(os.path.realpath(path), stat_result.st_mtime_ns, stat_result.st_size)] = analysis
+    return analyses
 
 def extract_functions(file_path: str) -> List[Dict]:
     """Extract function names and their docstrings from a Python file."""
-    with open(file_path, 'r', encoding='utf-8') as f:
-        tree = ast.parse(f.read(), filename=file_path)
-    functions = []
-    for node in ast.walk(tree):
-        if isinstance(node, ast.FunctionDef):
-            doc = ast.get_docstring(node)
-            functions.append({
-                'name': node.name,
-                'lineno': node.lineno,
-                'docstring': doc
-            })
-    return functions
+    return [{'name': func['name'], 'lineno': func['lineno'], 'docstring': func['docstring']}
+            for func in analyze_file(file_path)['functions']]
 
 def extract_classes(file_path: str) -> List[Dict]:
     """Extract class names and their docstrings from a Python file."""
-    with open(file_path, 'r', encoding='utf-8') as f:
-        tree = ast.parse(f.read(), filename=file_path)
-    classes = []
-    for node in ast.walk(tree):
-        if isinstance(node, ast.ClassDef):
-            doc = ast.get_docstring(node)
-            classes.append({
-                'name': node.name,
-                'lineno': node.lineno,
-                'docstring': doc
-            })
-    return classes
+    return [{'name': cls['name'], 'lineno': cls['lineno'], 'docstring': cls['docstring']}
+            for cls in analyze_file(file_path)['classes']]
 
 def summarize_file(file_path: str) -> str:
     """Summarize the purpose of a Python file using its top-level docstring or comments."""
-    with open(file_path, 'r', encoding='utf-8') as f:
-        source = f.read()
     try:
-        tree = ast.parse(source, filename=file_path)
-        doc = ast.get_docstring(tree)
-        if doc:
-            return doc
-    except Exception:
+        analysis = analyze_file(file_path)
+        return analysis['module_docstring'] or analysis['first_comment'] or "No summary available."
+    except SyntaxError:
         pass
     # Fallback: use first comment block
-    for line in source.splitlines():
-        if line.strip().startswith('#'):
-            return line.strip('#').strip()
-    return "No summary available."
+    with open(file_path, 'r', encoding='utf-8') as f:
+        return _first_comment(f.read()) or "No summary available."
 
 def list_python_files(directory: str) -> List[str]:
     """Recursively list all Python files in a directory."""
@@ -61,8 +161,8 @@ def list_python_files(directory: str) -> List[str]:
 def extract_classes_in_directory(directory: str) -> Dict[str, List[Dict]]:
     """List all classes in all Python files in a directory."""
     result = {}
-    for file_path in list_python_files(directory):
-        classes = extract_classes(file_path)
-        if classes:
-            result[file_path] = classes
-    return result 
\ No newline at end of file
+    for file_path, analysis in analyze_directory(directory).items():
+        if analysis['classes']:
+            result[file_path] = [{'name': cls['name'], 'lineno': cls['lineno'], 'docstring': cls['docstring']}
+                                 for cls in analysis['classes']]
+    return result
\ No newline at end of file
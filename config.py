@@ -19,11 +19,48 @@ class Config:
     
     # Vector Store Configuration
     VECTOR_STORE_PATH = os.getenv("VECTOR_STORE_PATH", "./vector_store")
+    VECTOR_STORE_CACHE_SIZE = int(os.getenv("VECTOR_STORE_CACHE_SIZE", "5"))  # Loaded repositories kept in memory
     
     # Model Configuration - Using more reliable models
     EMBEDDING_MODEL = os.getenv("EMBEDDING_MODEL", "paraphrase-MiniLM-L3-v2")  # Smaller, faster model
+    # Seconds before a model that failed to load (and was replaced by a fallback) is tried again
+    EMBEDDING_RETRY_SECONDS = float(os.getenv("EMBEDDING_RETRY_SECONDS", "300"))
     LLM_MODEL = os.getenv("LLM_MODEL", "gpt-3.5-turbo")  # Used for OpenAI
     
+    # Number of chunks encoded per forward pass when building the index
+    EMBEDDING_BATCH_SIZE = int(os.getenv("EMBEDDING_BATCH_SIZE", "64"))
+    # Worker processes (each with its own model copy) used for large ingestions; 1 = in-process
+    EMBEDDING_WORKERS = int(os.getenv("EMBEDDING_WORKERS", "1"))
+    
+    # Similarity: "cosine" (normalized embeddings, inner-product index) or "l2" (raw embeddings)
+    VECTOR_METRIC = os.getenv("VECTOR_METRIC", "cosine")
+    # Search hits below this cosine similarity are not handed to the agent
+    SEARCH_SCORE_THRESHOLD = float(os.getenv("SEARCH_SCORE_THRESHOLD", "0.2"))
+    
+    # Query embeddings and search results kept in memory; set QUERY_CACHE_PATH to persist embeddings
+    QUERY_CACHE_SIZE = int(os.getenv("QUERY_CACHE_SIZE", "1024"))
+    QUERY_CACHE_PATH = os.getenv("QUERY_CACHE_PATH", "")
+    # Demo-mode answers kept per agent, invalidated when the index changes
+    DEMO_CACHE_SIZE = int(os.getenv("DEMO_CACHE_SIZE", "256"))
+    
+    # Hybrid retrieval: BM25 over code tokens fused with vector hits by reciprocal rank
+    BM25_K1 = float(os.getenv("BM25_K1", "1.2"))
+    BM25_B = float(os.getenv("BM25_B", "0.75"))
+    HYBRID_RRF_K = int(os.getenv("HYBRID_RRF_K", "60"))
+    
+    # FAISS index: "flat" (exact), "ivf_flat", "ivf_pq" or "hnsw" (approximate)
+    FAISS_INDEX_TYPE = os.getenv("FAISS_INDEX_TYPE", "flat")
+    FAISS_TRAIN_SIZE = int(os.getenv("FAISS_TRAIN_SIZE", "50000"))  # Embeddings sampled to train IVF indexes
+    FAISS_NLIST = int(os.getenv("FAISS_NLIST", "1024"))  # IVF cells (capped by training size)
+    FAISS_PQ_M = int(os.getenv("FAISS_PQ_M", "16"))  # PQ sub-quantizers
+    FAISS_HNSW_M = int(os.getenv("FAISS_HNSW_M", "32"))
+    FAISS_HNSW_EF_CONSTRUCTION = int(os.getenv("FAISS_HNSW_EF_CONSTRUCTION", "80"))
+    FAISS_NPROBE = int(os.getenv("FAISS_NPROBE", "16"))  # IVF cells visited per query
+    FAISS_EF_SEARCH = int(os.getenv("FAISS_EF_SEARCH", "64"))  # HNSW candidate list size per query
+    
+    # Memory-map saved indexes read-only so processes serving the same repository share one copy
+    FAISS_MMAP = os.getenv("FAISS_MMAP", "true").lower() == "true"
+    
     # Network Configuration
     REQUEST_TIMEOUT = int(os.getenv("REQUEST_TIMEOUT", "30"))  # 30 seconds timeout
     MAX_RETRIES = int(os.getenv("MAX_RETRIES", "3"))
@@ -38,9 +75,28 @@ class Config:
         '.md', '.txt', '.rst', '.tex'
     }
     
+    # Directories never descended into during repository walks
+    IGNORED_DIRECTORIES = {'.git', '__pycache__', 'node_modules', '.venv', 'venv', 'env'}
+    
+    # Parallel file reading and chunking during ingestion ("thread" or "process" pool)
+    INGEST_WORKERS = int(os.getenv("INGEST_WORKERS", str(min(32, (os.cpu_count() or 1) + 4))))
+    INGEST_EXECUTOR = os.getenv("INGEST_EXECUTOR", "thread")
+    
+    # Keep a loaded local repository's index current as files change (needs watchdog)
+    WATCH_FILES = os.getenv("WATCH_FILES", "false").lower() == "true"
+    WATCH_DEBOUNCE_SECONDS = float(os.getenv("WATCH_DEBOUNCE_SECONDS", "1.0"))  # Quiet time before applying changes
+    
     # Maximum file size to process (in bytes)
     MAX_FILE_SIZE = 1024 * 1024  # 1MB
     
+    # Approximate tokens the file reader returns per call before truncating with a continuation marker
+    FILE_READER_TOKEN_BUDGET = int(os.getenv("FILE_READER_TOKEN_BUDGET", "2000"))
+    # Entries per page returned by the directory lister
+    DIRECTORY_PAGE_SIZE = int(os.getenv("DIRECTORY_PAGE_SIZE", "200"))
+    
     # Chunk size for text splitting
     CHUNK_SIZE = 1000
-    CHUNK_OVERLAP = 200
\ No newline at end of file
+    CHUNK_OVERLAP = 200
+    
+    # Chunk Python files along functions/classes/methods instead of fixed-size windows
+    AST_CHUNKING = os.getenv("AST_CHUNKING", "true").lower() == "true"
\ No newline at end of file
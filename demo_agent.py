@@ -1,32 +1,48 @@
 import os
-from typing import List, Dict, Any
+import threading
+from collections import Counter
+from typing import List, Dict, Any, Iterator, Optional
 from langchain.schema import BaseMessage, HumanMessage, AIMessage
+from chatbortai.config import Config
+from chatbortai.query_cache import LRUCache, normalize_query
+from chatbortai.symbol_index import extract_symbols
 from chatbortai.tools import FileSearchTool, FileReaderTool, ASTParserTool, DirectoryListerTool
+from chatbortai.tools import DirectoryEntry, DirectoryListing, FileStructure
 
 class DemoAgent:
     """Demo agent that actually uses tools to analyze uploaded code"""
     
     def __init__(self, vector_store=None):
         self.vector_store = vector_store
+        self.symbol_index = getattr(vector_store, 'symbol_index', None)
+        self.statistics = getattr(vector_store, 'statistics', None)
         self.tools = []
-        self.analysis_cache = {}  # Cache previous analyses
+        # Answers by (intent, question, index version); evicted least recently used
+        self.analysis_cache = LRUCache(Config.DEMO_CACHE_SIZE)
         self.question_count = {}  # Track how many times each type of question is asked
+        # Per thread (aask answers in worker threads): whether the current answer read files on disk
+        self._answer_state = threading.local()
         self._initialize_tools()
     
     def _initialize_tools(self):
-        """Initialize all tools"""
+        """Initialize all tools once; analyses reuse them"""
         # File search tool
+        self.search_tool = None
         if self.vector_store:
-            self.tools.append(FileSearchTool(self.vector_store, self.vector_store.embedding_model))
+            self.search_tool = FileSearchTool(self.vector_store)
+            self.tools.append(self.search_tool)
         
         # File reader tool
-        self.tools.append(FileReaderTool())
+        self.file_reader = FileReaderTool(self.vector_store)
+        self.tools.append(self.file_reader)
         
         # AST parser tool
-        self.tools.append(ASTParserTool())
+        self.ast_parser = ASTParserTool(self.vector_store)
+        self.tools.append(self.ast_parser)
         
         # Directory lister tool
-        self.tools.append(DirectoryListerTool())
+        self.directory_lister = DirectoryListerTool(getattr(self.vector_store, 'directory_tree', None))
+        self.tools.append(self.directory_lister)
     
     def ask(self, question: str, chat_history: List = None) -> str:
         """Process question and use tools to provide real analysis"""
@@ -36,8 +52,26 @@ class DemoAgent:
         try:
             question_lower = question.lower()
             
+            # Answers only change with the index, except open-ended analyses that give
+            # different insights on each repetition (they start a new round and are not cached)
+            cache_key = None
+            question_type = self._get_question_type(question_lower)
+            index_version = getattr(self.vector_store, 'index_version', None)
+            if index_version is not None:
+                cache_key = (question_type, normalize_query(question), index_version)
+                cached = self.analysis_cache.get(cache_key)
+                if cached is not None:
+                    return cached
+            round_before = self.question_count.get(question_type, 0)
+            self._answer_state.reads_live_files = False
+            
             # First, try to understand the specific question and provide a direct answer
-            return self._answer_specific_question(question, question_lower, chat_history)
+            answer = self._answer_specific_question(question, question_lower, chat_history)
+            # Answers read from files on disk can change without the index changing
+            if (cache_key is not None and self.question_count.get(question_type, 0) == round_before
+                    and not self._answer_state.reads_live_files and not answer.startswith("I encountered an error")):
+                self.analysis_cache.put(cache_key, answer)
+            return answer
                 
         except Exception as e:
             return f"I encountered an error while analyzing your code: {str(e)}"
@@ -82,26 +116,27 @@ class DemoAgent:
                 break
         
         if filename:
+            self._answer_state.reads_live_files = True
             try:
-                # Check if file exists and read it
-                file_tool = FileReaderTool()
-                file_content = file_tool._run(filename)
-                
-                if "File not found" in file_content:
+                # Check if file exists
+                if not os.path.isfile(filename):
                     return f"I couldn't find the file '{filename}' in your uploaded code. Here are the files I can see:\n\n" + self._list_available_files()
                 
                 # Analyze the specific file
                 result = f"# 📄 Analysis of {filename}\n\n"
                 
                 if filename.endswith('.py'):
-                    ast_tool = ASTParserTool()
+                    ast_tool = self.ast_parser
                     ast_analysis = ast_tool._run(filename)
                     result += ast_analysis + "\n\n"
                 
-                # Add relevant content based on question
+                # Add relevant content based on question (the whole file, not the reader's first page)
                 if 'function' in question_lower:
-                    lines = file_content.split('\n')
-                    func_lines = [line for line in lines if 'def ' in line]
+                    try:
+                        func_lines = [record.signature for record in self.ast_parser.structure(filename).functions]
+                    except (ValueError, SyntaxError):
+                        # Not Python, or unparsable: fall back to scanning the text
+                        func_lines = [line for line in self._read_text(filename).split('\n') if 'def ' in line]
                     if func_lines:
                         result += "## Function Definitions:\n"
                         for func_line in func_lines:
@@ -214,26 +249,25 @@ class DemoAgent:
         """Search for a specific element in the code"""
         result = f"# 🔍 Searching for {element_type}: '{element_name}'\n\n"
         
+        # Definitions come straight from the symbol table
+        if self.symbol_index is not None:
+            definitions = self._find_definitions(element_name.strip("'\"`?()"))
+            if definitions:
+                return result + self._describe_definitions(definitions)
+        
+        # Identifier lookups go through the keyword index instead of reading every file
+        if self.vector_store is not None and len(getattr(self.vector_store, 'lexical_index', ())):
+            return result + self._search_indexed_element(element_name)
+        
         try:
             # Search through Python files
-            dir_tool = DirectoryListerTool()
-            files_info = dir_tool._run(".")
-            
-            python_files = []
-            if "📄" in files_info:
-                lines = files_info.split('\n')
-                for line in lines:
-                    if ".py" in line and "📄" in line:
-                        filename = line.split("📄")[-1].strip()
-                        if filename and not filename.startswith("("):
-                            python_files.append(filename)
+            python_files = self._list_directory(".").python_files()
             
             found_in_files = []
-            file_tool = FileReaderTool()
             
             for py_file in python_files:
                 try:
-                    file_content = file_tool._run(py_file)
+                    file_content = self._read_text(py_file)
                     if element_name in file_content:
                         found_in_files.append(py_file)
                         
@@ -266,40 +300,91 @@ class DemoAgent:
         
         return result
     
+    def _find_definitions(self, name: str) -> List[Dict[str, Any]]:
+        """Symbol table matches for a name, re-parsing files that changed since they were indexed"""
+        definitions = []
+        stale_files = []
+        for symbol in self.symbol_index.find(name):
+            if self.vector_store is None or self.vector_store.is_file_current(symbol['file_path']):
+                definitions.append(symbol)
+            elif symbol['file_path'] not in stale_files:
+                stale_files.append(symbol['file_path'])
+        
+        for file_path in stale_files:
+            try:
+                symbols = extract_symbols(self._read_text(file_path), file_path)['symbols']
+            except (OSError, SyntaxError, ValueError):
+                continue  # Deleted, or no longer parses
+            definitions.extend(symbol for symbol in symbols if name in (symbol['name'], symbol['qualified_name']))
+        return definitions
+    
+    def _read_text(self, file_path: str) -> str:
+        """Whole text of a file, for scans that must not stop at the file reader's page budget"""
+        self._answer_state.reads_live_files = True
+        with open(file_path, 'r', encoding='utf-8', errors='replace') as f:
+            return f.read()
+    
+    def _describe_definitions(self, definitions: List[Dict[str, Any]]) -> str:
+        """Describe symbol table entries: location, signature, parent class and docstring"""
+        result = ""
+        for symbol in definitions:
+            result += f"## {symbol['kind'].title()} `{symbol['qualified_name']}`\n"
+            result += f"Defined in {symbol['file_path']}, lines {symbol['start_line']}-{symbol['end_line']}\n"
+            result += "```python\n"
+            for decorator in symbol['decorators']:
+                result += f"@{decorator}\n"
+            result += f"{symbol['signature']}\n```\n"
+            if symbol['parent_class']:
+                result += f"Method of class `{symbol['parent_class']}`\n"
+            if symbol['docstring']:
+                result += f"\n{symbol['docstring']}\n"
+            result += "\n"
+        result += f"✅ Found {len(definitions)} definition(s)\n"
+        return result
+    
+    def _search_indexed_element(self, element_name: str) -> str:
+        """Find an identifier with the BM25 index and show the matching lines of each hit"""
+        result = ""
+        found_in_files = []
+        for doc, _ in self.vector_store.lexical_search(element_name, k=10):
+            file_path = doc.metadata.get('file_path', 'Unknown')
+            lines = doc.page_content.split('\n')
+            relevant_lines = []
+            for i, line in enumerate(lines):
+                if element_name in line:
+                    # Get context (line before and after)
+                    relevant_lines.extend(lines[max(0, i-1):min(len(lines), i+2)])
+            
+            if not relevant_lines:
+                continue
+            if file_path not in found_in_files:
+                found_in_files.append(file_path)
+            result += f"## Found in {file_path}:\n```python\n"
+            result += '\n'.join(relevant_lines[:10])  # Limit output
+            result += "\n```\n"
+        
+        if found_in_files:
+            result += f"✅ Found '{element_name}' in {len(found_in_files)} files: {', '.join(found_in_files)}\n"
+        else:
+            result += f"❌ Could not find '{element_name}' in the indexed repository.\n"
+        return result
+    
     def _count_functions(self) -> str:
         """Count total functions across all files"""
         result = "# 📊 Function Count Analysis\n\n"
         
+        summary = self._repository_summary()
+        if summary is not None:
+            return result + self._count_summarized(summary, 'functions', 'most_functions', "functions")
+        
         try:
-            dir_tool = DirectoryListerTool()
-            files_info = dir_tool._run(".")
-            
-            python_files = []
-            if "📄" in files_info:
-                lines = files_info.split('\n')
-                for line in lines:
-                    if ".py" in line and "📄" in line:
-                        filename = line.split("📄")[-1].strip()
-                        if filename and not filename.startswith("("):
-                            python_files.append(filename)
-            
             total_functions = 0
             file_function_counts = {}
             
-            ast_tool = ASTParserTool()
-            for py_file in python_files:
-                try:
-                    analysis = ast_tool._run(py_file)
-                    if "Functions (" in analysis:
-                        func_count_str = analysis.split("Functions (")[1].split(")")[0]
-                        try:
-                            func_count = int(func_count_str)
-                            file_function_counts[py_file] = func_count
-                            total_functions += func_count
-                        except:
-                            pass
-                except:
-                    continue
+            for structure in self._file_structures():
+                if structure.functions:
+                    file_function_counts[structure.file_path] = len(structure.functions)
+                    total_functions += len(structure.functions)
             
             result += f"**Total Functions Found: {total_functions}**\n\n"
             result += "## Functions per file:\n"
@@ -315,36 +400,18 @@ class DemoAgent:
         """Count total classes across all files"""
         result = "# 📊 Class Count Analysis\n\n"
         
+        summary = self._repository_summary()
+        if summary is not None:
+            return result + self._count_summarized(summary, 'classes', 'most_classes', "classes")
+        
         try:
-            dir_tool = DirectoryListerTool()
-            files_info = dir_tool._run(".")
-            
-            python_files = []
-            if "📄" in files_info:
-                lines = files_info.split('\n')
-                for line in lines:
-                    if ".py" in line and "📄" in line:
-                        filename = line.split("📄")[-1].strip()
-                        if filename and not filename.startswith("("):
-                            python_files.append(filename)
-            
             total_classes = 0
             file_class_counts = {}
             
-            ast_tool = ASTParserTool()
-            for py_file in python_files:
-                try:
-                    analysis = ast_tool._run(py_file)
-                    if "Classes (" in analysis:
-                        class_count_str = analysis.split("Classes (")[1].split(")")[0]
-                        try:
-                            class_count = int(class_count_str)
-                            file_class_counts[py_file] = class_count
-                            total_classes += class_count
-                        except:
-                            pass
-                except:
-                    continue
+            for structure in self._file_structures():
+                if structure.classes:
+                    file_class_counts[structure.file_path] = len(structure.classes)
+                    total_classes += len(structure.classes)
             
             result += f"**Total Classes Found: {total_classes}**\n\n"
             result += "## Classes per file:\n"
@@ -356,32 +423,51 @@ class DemoAgent:
         
         return result
     
+    def _repository_summary(self) -> Optional[Dict[str, Any]]:
+        """Repo-wide statistics computed at ingest time, or None without an indexed repository"""
+        if self.statistics is None or not self.statistics.files:
+            return None
+        return self.statistics.summary
+    
+    def _count_summarized(self, summary: Dict[str, Any], key: str, ranking: str, label: str) -> str:
+        """Repository total of a count plus the files with the most of it"""
+        result = f"**Total {label.title()} Found: {summary[key]}** (across {summary['files']} indexed files)\n\n"
+        if summary[ranking]:
+            result += f"## Files with the most {label}:\n"
+            for filename, count in summary[ranking]:
+                result += f"- {filename}: {count} {label}\n"
+        return result
+    
+    def _describe_summary(self, summary: Dict[str, Any]) -> str:
+        """Files, lines and definitions of the whole repository, by language and largest file"""
+        result = f"**Total Files: {summary['files']}** ({summary['loc']} lines of code, {summary['lines']} lines in total)\n"
+        result += f"- Functions: {summary['functions']}\n"
+        result += f"- Classes: {summary['classes']}\n\n"
+        result += "## Files by language:\n"
+        for language, counts in summary['languages'].items():
+            result += f"- {language}: {counts['files']} files, {counts['loc']} lines of code\n"
+        if summary['largest_files']:
+            result += "\n## Largest files:\n"
+            for filename, size in summary['largest_files'][:5]:
+                result += f"- {filename}: {size} bytes\n"
+        return result
+    
     def _count_files(self) -> str:
         """Count files by type"""
         result = "# 📊 File Count Analysis\n\n"
         
+        summary = self._repository_summary()
+        if summary is not None:
+            return result + self._describe_summary(summary)
+        
         try:
-            dir_tool = DirectoryListerTool()
-            files_info = dir_tool._run(".")
-            
-            file_types = {}
-            total_files = 0
+            files = self._list_directory(".").files
+            file_types = self._count_extensions(files)
             
-            lines = files_info.split('\n')
-            for line in lines:
-                if "📄" in line:
-                    total_files += 1
-                    if "." in line:
-                        # Extract file extension
-                        parts = line.split(".")
-                        if len(parts) > 1:
-                            ext = parts[-1].split()[0]  # Get extension before any other text
-                            file_types[ext] = file_types.get(ext, 0) + 1
-            
-            result += f"**Total Files: {total_files}**\n\n"
+            result += f"**Total Files: {len(files)}**\n\n"
             result += "## Files by type:\n"
             for ext, count in sorted(file_types.items()):
-                result += f"- .{ext}: {count} files\n"
+                result += f"- {ext}: {count} files\n"
                 
         except Exception as e:
             result += f"Error counting files: {str(e)}\n"
@@ -392,61 +478,57 @@ class DemoAgent:
         """Count total imports across all files"""
         result = "# 📊 Import Count Analysis\n\n"
         
+        summary = self._repository_summary()
+        if summary is not None:
+            result += f"**Total Import Statements: {summary['imports']}**\n"
+            result += f"**Unique Modules: {summary['unique_modules']}**\n\n"
+            if summary['most_imported']:
+                result += "## Most imported modules:\n"
+                for module, count in summary['most_imported']:
+                    result += f"- {module} (imported by {count} files)\n"
+            return result
+        
         try:
-            dir_tool = DirectoryListerTool()
-            files_info = dir_tool._run(".")
+            import_counts = Counter()
+            for structure in self._file_structures():
+                import_counts.update(structure.imports)
             
-            python_files = []
-            if "📄" in files_info:
-                lines = files_info.split('\n')
-                for line in lines:
-                    if ".py" in line and "📄" in line:
-                        filename = line.split("📄")[-1].strip()
-                        if filename and not filename.startswith("("):
-                            python_files.append(filename)
+            result += f"**Total Import Statements: {sum(import_counts.values())}**\n"
+            result += f"**Unique Imports: {len(import_counts)}**\n\n"
             
-            total_imports = 0
-            all_imports = set()
-            
-            ast_tool = ASTParserTool()
-            for py_file in python_files:
-                try:
-                    analysis = ast_tool._run(py_file)
-                    if "Imports (" in analysis:
-                        import_count_str = analysis.split("Imports (")[1].split(")")[0]
-                        try:
-                            import_count = int(import_count_str)
-                            total_imports += import_count
-                            
-                            # Extract import names
-                            lines = analysis.split('\n')
-                            for line in lines:
-                                if line.strip().startswith('- '):
-                                    import_name = line.strip()[2:]
-                                    all_imports.add(import_name)
-                        except:
-                            pass
-                except:
-                    continue
-            
-            result += f"**Total Import Statements: {total_imports}**\n"
-            result += f"**Unique Imports: {len(all_imports)}**\n\n"
-            
-            if all_imports:
+            if import_counts:
                 result += "## Most common imports:\n"
-                for imp in sorted(list(all_imports))[:15]:  # Show top 15
-                    result += f"- {imp}\n"
+                for imp, count in import_counts.most_common(15):  # Show top 15
+                    result += f"- {imp} ({count})\n"
                 
         except Exception as e:
             result += f"Error counting imports: {str(e)}\n"
         
         return result
     
+    def _file_structures(self, python_files: List[str] = None) -> Iterator[FileStructure]:
+        """Structure of each Python file (default: those in the working directory); unparsable files are skipped"""
+        if python_files is None:
+            python_files = self._list_directory(".").python_files()
+        for py_file in python_files:
+            try:
+                yield self.ast_parser.structure(py_file)
+            except Exception:
+                continue
+    
+    def _list_directory(self, directory_path: str) -> DirectoryListing:
+        """Directory listing; answers built from it are not cached, since files may appear or vanish"""
+        self._answer_state.reads_live_files = True
+        return self.directory_lister.list_directory(directory_path)
+    
+    def _count_extensions(self, files: List[DirectoryEntry]) -> Dict[str, int]:
+        """Number of files per extension; files without one are not counted"""
+        return dict(Counter(entry.extension for entry in files if entry.extension))
+    
     def _list_available_files(self) -> str:
         """List all available files"""
         try:
-            dir_tool = DirectoryListerTool()
-            return dir_tool._run(".")
+            return self._list_directory(".").render()
         except:
             return "Could not list files."
     
@@ -477,47 +559,26 @@ class DemoAgent:
         # Try to find Python files and analyze them
         try:
             # Use directory lister to find files
-            dir_tool = DirectoryListerTool()
-            files_info = dir_tool._run(".")
-            
-            # Look for Python files
-            python_files = []
-            if "📄" in files_info:
-                lines = files_info.split('\n')
-                for line in lines:
-                    if ".py" in line and "📄" in line:
-                        # Extract filename
-                        filename = line.split("📄")[-1].strip()
-                        if filename and not filename.startswith("("):
-                            python_files.append(filename)
+            python_files = self._list_directory(".").python_files()
             
             if python_files:
                 result += f"Found {len(python_files)} Python files. Analyzing functions...\n\n"
                 
                 # Analyze each Python file with varying detail
-                ast_tool = ASTParserTool()
+                ast_tool = self.ast_parser
                 file_limit = min(3 + repeat_count, len(python_files))  # Show more files on repeat
                 
                 for py_file in python_files[:file_limit]:
                     try:
-                        analysis = ast_tool._run(py_file)
-                        result += f"## {py_file}\n{analysis}\n\n"
+                        structure = ast_tool.structure(py_file)
+                        result += f"## {py_file}\n{structure.render()}\n\n"
                         
                         # Add more detail on repeat questions
-                        if repeat_count > 1:
-                            try:
-                                file_tool = FileReaderTool()
-                                file_content = file_tool._run(py_file)
-                                # Extract just function definitions for detailed view
-                                lines = file_content.split('\n')
-                                func_lines = [line for line in lines if 'def ' in line]
-                                if func_lines:
-                                    result += f"### Function Signatures in {py_file}:\n"
-                                    for func_line in func_lines[:5]:  # Show first 5 function signatures
-                                        result += f"```python\n{func_line.strip()}\n```\n"
-                                    result += "\n"
-                            except:
-                                pass
+                        if repeat_count > 1 and structure.functions:
+                            result += f"### Function Signatures in {py_file}:\n"
+                            for record in structure.functions[:5]:  # Show first 5 function signatures
+                                result += f"```python\n{record.signature}\n```\n"
+                            result += "\n"
                     except:
                         result += f"## {py_file}\nCould not analyze this file.\n\n"
             else:
@@ -539,44 +600,26 @@ class DemoAgent:
         
         try:
             # Similar to function analysis but focus on classes
-            dir_tool = DirectoryListerTool()
-            files_info = dir_tool._run(".")
-            
-            python_files = []
-            if "📄" in files_info:
-                lines = files_info.split('\n')
-                for line in lines:
-                    if ".py" in line and "📄" in line:
-                        filename = line.split("📄")[-1].strip()
-                        if filename and not filename.startswith("("):
-                            python_files.append(filename)
+            python_files = self._list_directory(".").python_files()
             
             if python_files:
                 result += f"Analyzing classes in {len(python_files)} Python files...\n\n"
                 
-                ast_tool = ASTParserTool()
+                ast_tool = self.ast_parser
                 file_limit = min(3 + repeat_count, len(python_files))
                 
                 for py_file in python_files[:file_limit]:
                     try:
-                        analysis = ast_tool._run(py_file)
-                        if "Classes" in analysis:
-                            result += f"## {py_file}\n{analysis}\n\n"
+                        structure = ast_tool.structure(py_file)
+                        if structure.classes:
+                            result += f"## {py_file}\n{structure.render()}\n\n"
                             
                             # Add class method details on repeat
                             if repeat_count > 1:
-                                try:
-                                    file_tool = FileReaderTool()
-                                    file_content = file_tool._run(py_file)
-                                    lines = file_content.split('\n')
-                                    class_lines = [line for line in lines if 'class ' in line]
-                                    if class_lines:
-                                        result += f"### Class Definitions in {py_file}:\n"
-                                        for class_line in class_lines:
-                                            result += f"```python\n{class_line.strip()}\n```\n"
-                                        result += "\n"
-                                except:
-                                    pass
+                                result += f"### Class Definitions in {py_file}:\n"
+                                for record in structure.classes:
+                                    result += f"```python\n{record.signature}\n```\n"
+                                result += "\n"
                     except:
                         continue
             else:
@@ -597,39 +640,30 @@ class DemoAgent:
             result = f"# 📦 Complete Import Mapping (Analysis #{repeat_count})\n\n"
         
         try:
-            dir_tool = DirectoryListerTool()
-            files_info = dir_tool._run(".")
-            
-            python_files = []
-            if "📄" in files_info:
-                lines = files_info.split('\n')
-                for line in lines:
-                    if ".py" in line and "📄" in line:
-                        filename = line.split("📄")[-1].strip()
-                        if filename and not filename.startswith("("):
-                            python_files.append(filename)
+            python_files = self._list_directory(".").python_files()
             
             if python_files:
                 result += f"Analyzing imports in {len(python_files)} Python files...\n\n"
                 
-                ast_tool = ASTParserTool()
+                ast_tool = self.ast_parser
                 all_imports = set()
                 
                 for py_file in python_files[:5]:
                     try:
-                        analysis = ast_tool._run(py_file)
-                        if "Imports" in analysis:
-                            result += f"## {py_file}\n{analysis}\n\n"
-                            # Extract imports for summary
-                            lines = analysis.split('\n')
-                            for line in lines:
-                                if line.strip().startswith('- '):
-                                    import_name = line.strip()[2:]
-                                    all_imports.add(import_name)
+                        structure = ast_tool.structure(py_file)
+                        if structure.imports:
+                            result += f"## {py_file}\n{structure.render()}\n\n"
+                            all_imports.update(structure.imports)
                     except:
                         continue
                 
-                if all_imports:
+                summary = self._repository_summary()
+                if summary is not None and summary['most_imported']:
+                    result += f"## Summary\nTotal unique modules imported across the repository: {summary['unique_modules']}\n"
+                    result += "Most imported modules:\n"
+                    for module, count in summary['most_imported'][:10]:
+                        result += f"- {module} ({count} files)\n"
+                elif all_imports:
                     result += f"## Summary\nTotal unique imports found: {len(all_imports)}\n"
                     result += "Most common imports:\n"
                     for imp in sorted(list(all_imports))[:10]:
@@ -652,26 +686,21 @@ class DemoAgent:
             result = f"# 📁 Complete Project Architecture (View #{repeat_count})\n\n"
         
         try:
-            dir_tool = DirectoryListerTool()
-            structure = dir_tool._run(".")
-            result += structure
+            listing = self._list_directory(".")
+            result += listing.render()
             
-            # Count different file types
-            lines = structure.split('\n')
-            file_types = {}
-            total_files = 0
+            summary = self._repository_summary()
+            if summary is not None:
+                result += "\n## Repository Summary\n" + self._describe_summary(summary)
+                return result
             
-            for line in lines:
-                if "📄" in line:
-                    total_files += 1
-                    if "." in line:
-                        ext = line.split(".")[-1].split()[0]
-                        file_types[ext] = file_types.get(ext, 0) + 1
+            # Count different file types
+            file_types = self._count_extensions(listing.files)
             
             if file_types:
-                result += f"\n## File Type Summary\nTotal files: {total_files}\n\n"
+                result += f"\n## File Type Summary\nTotal files: {len(listing.files)}\n\n"
                 for ext, count in sorted(file_types.items()):
-                    result += f"- .{ext}: {count} files\n"
+                    result += f"- {ext}: {count} files\n"
                     
         except Exception as e:
             result += f"Error during analysis: {str(e)}\n"
@@ -684,7 +713,7 @@ class DemoAgent:
         
         try:
             if self.vector_store and hasattr(self.vector_store, 'faiss_index'):
-                search_tool = FileSearchTool(self.vector_store, self.vector_store.embedding_model)
+                search_tool = self.search_tool
                 search_results = search_tool._run(query)
                 result += search_results
             else:
@@ -706,47 +735,28 @@ class DemoAgent:
         
         try:
             # Get file structure
-            dir_tool = DirectoryListerTool()
-            structure = dir_tool._run(".")
+            listing = self._list_directory(".")
             
-            if "📄" in structure:
+            if listing.files:
                 result += "## Files Uploaded\n"
-                result += structure + "\n\n"
+                result += listing.render() + "\n\n"
                 
                 # Quick analysis of Python files
-                lines = structure.split('\n')
-                python_files = []
-                for line in lines:
-                    if ".py" in line and "📄" in line:
-                        filename = line.split("📄")[-1].strip()
-                        if filename and not filename.startswith("("):
-                            python_files.append(filename)
+                python_files = listing.python_files()
+                summary = self._repository_summary()
                 
-                if python_files:
+                if summary is not None:
+                    result += "## Repository Summary\n" + self._describe_summary(summary) + "\n"
+                elif python_files:
                     result += f"## Quick Python Analysis\nFound {len(python_files)} Python files:\n\n"
                     
-                    ast_tool = ASTParserTool()
                     total_functions = 0
                     total_classes = 0
                     
-                    for py_file in python_files[:3]:
-                        try:
-                            analysis = ast_tool._run(py_file)
-                            # Count functions and classes
-                            if "Functions (" in analysis:
-                                func_count = analysis.split("Functions (")[1].split(")")[0]
-                                try:
-                                    total_functions += int(func_count)
-                                except:
-                                    pass
-                            if "Classes (" in analysis:
-                                class_count = analysis.split("Classes (")[1].split(")")[0]
-                                try:
-                                    total_classes += int(class_count)
-                                except:
-                                    pass
-                        except:
-                            continue
+                    # Count functions and classes
+                    for structure in self._file_structures(python_files[:3]):
+                        total_functions += len(structure.functions)
+                        total_classes += len(structure.classes)
                     
                     result += f"- Total functions found: {total_functions}\n"
                     result += f"- Total classes found: {total_classes}\n\n"
@@ -0,0 +1,225 @@
+import os
+import json
+from fnmatch import fnmatch
+from typing import Dict, List, Any, Optional, Iterator, Tuple
+from chatbortai.config import Config
+
+DIRECTORY_TREE_FILENAME = "directory_tree.json"
+DIRECTORY_TREE_VERSION = 2
+
+def _join(rel_dir: str, name: str) -> str:
+    return f"{rel_dir}/{name}" if rel_dir else name
+
+def _scan(path: str, mtime_ns: int) -> Dict[str, Any]:
+    """One directory level: subdirectory names and file sizes.
+
+    Every entry is recorded, as the directory lister always showed them. Hidden and ignored
+    directories and symlinked directories go in 'listed' and are not descended into; broken
+    symlinks and special files go in 'special' and are never ingested.
+    """
+    dirs = []
+    listed = []
+    files = {}
+    special = []
+    with os.scandir(path) as entries:
+        for entry in entries:
+            try:
+                if entry.is_dir(follow_symlinks=False):
+                    if entry.name.startswith('.') or entry.name in Config.IGNORED_DIRECTORIES:
+                        listed.append(entry.name)
+                    else:
+                        dirs.append(entry.name)
+                elif entry.is_dir():
+                    listed.append(entry.name)
+                elif entry.is_file():
+                    files[entry.name] = entry.stat().st_size
+                else:
+                    special.append(entry.name)
+            except OSError:
+                continue
+    return {'mtime_ns': mtime_ns, 'dirs': sorted(dirs), 'listed': sorted(listed),
+            'files': dict(sorted(files.items())), 'special': sorted(special)}
+
+class DirectoryTree:
+    """In-memory snapshot of a repository's directories (subdirectories, file sizes, per-directory totals).
+
+    refresh() rescans only directories whose mtime changed, which covers files being added,
+    removed or renamed; sizes of files edited in place are updated through set_file_size.
+    """
+
+    def __init__(self, root: str = None):
+        self.root = root
+        # Relative directory path ("" for the root) ->
+        # {'mtime_ns', 'dirs': [names], 'listed': [names not descended into], 'files': {name: size}, 'special': [names]}
+        self.directories: Dict[str, Dict[str, Any]] = {}
+        self._totals: Optional[Dict[str, Tuple[int, int]]] = None
+        self._dirty = True
+
+    def refresh(self, root: str = None, max_depth: int = None) -> Dict[str, int]:
+        """Bring the snapshot up to date, scanning directories that are new or changed"""
+        root = str(root or self.root)
+        if root != self.root:
+            self.root = root
+            self.directories = {}
+
+        report = {'scanned': 0, 'reused': 0, 'removed': 0}
+        seen = set()
+        stack = [("", 0)]
+        while stack:
+            rel_dir, depth = stack.pop()
+            try:
+                mtime_ns = os.stat(os.path.join(root, rel_dir)).st_mtime_ns
+                node = self.directories.get(rel_dir)
+                if node is None or node['mtime_ns'] != mtime_ns:
+                    node = _scan(os.path.join(root, rel_dir), mtime_ns)
+                    self.directories[rel_dir] = node
+                    self._dirty = True
+                    report['scanned'] += 1
+                else:
+                    report['reused'] += 1
+            except OSError:
+                continue
+            seen.add(rel_dir)
+            if max_depth is None or depth + 1 < max_depth:
+                stack.extend((_join(rel_dir, name), depth + 1) for name in reversed(node['dirs']))
+
+        for rel_dir in [rel_dir for rel_dir in self.directories if rel_dir not in seen]:
+            del self.directories[rel_dir]
+            self._dirty = True
+            report['removed'] += 1
+        return report
+
+    def relative_path(self, path: str) -> Optional[str]:
+        """Path of a directory relative to the root, or None if the snapshot does not hold it"""
+        if self.root is None:
+            return None
+        try:
+            rel_dir = os.path.relpath(os.path.realpath(path), self.root)
+        except ValueError:
+            return None  # Different drive on Windows
+        if rel_dir == os.curdir:
+            rel_dir = ""
+        rel_dir = rel_dir.replace(os.sep, '/')
+        return rel_dir if rel_dir in self.directories else None
+
+    def is_current(self, rel_dir: str, depth: int = 1) -> bool:
+        """Whether rel_dir and the directories walk() would read below it are unchanged on disk"""
+        directories = self.directories
+        stack = [(rel_dir, 1)]
+        while stack:
+            path, level = stack.pop()
+            node = directories.get(path)
+            if node is None:
+                return False
+            try:
+                if os.stat(os.path.join(self.root, path)).st_mtime_ns != node['mtime_ns']:
+                    return False
+            except OSError:
+                return False
+            if level < depth:
+                stack.extend((_join(path, name), level + 1) for name in node['dirs'])
+        return True
+
+    def files(self, include_hidden: bool = False) -> Iterator[Tuple[str, int]]:
+        """(relative path, size) of every file, directory by directory in sorted walk order"""
+        stack = [""]
+        while stack:
+            rel_dir = stack.pop()
+            node = self.directories.get(rel_dir)
+            if node is None:
+                continue
+            for name, size in node['files'].items():
+                if include_hidden or not name.startswith('.'):
+                    yield _join(rel_dir, name), size
+            stack.extend(_join(rel_dir, name) for name in reversed(node['dirs']))
+
+    def set_file_size(self, rel_path: str, size: int):
+        """Record the current size of a file whose directory did not change"""
+        rel_dir, _, name = rel_path.rpartition('/')
+        node = self.directories.get(rel_dir)
+        if node is not None and node['files'].get(name) != size:
+            node['files'][name] = size
+            self._dirty = True
+
+    def totals(self, rel_dir: str) -> Tuple[int, int]:
+        """(files, bytes) under a directory, recursively"""
+        totals = self._totals
+        if self._dirty or totals is None:
+            # A file watcher may refresh the snapshot while this runs: sum over a copy, and clear
+            # the flag first so updates made meanwhile trigger another rebuild
+            self._dirty = False
+            directories = dict(self.directories)
+            totals = {}
+            # Deepest directories first so children are summed before their parents
+            for path in sorted(directories, key=lambda path: -path.count('/') - bool(path)):
+                node = directories[path]
+                file_count = len(node['files'])
+                size = sum(list(node['files'].values()))
+                for name in node['dirs']:
+                    child_files, child_size = totals.get(_join(path, name), (0, 0))
+                    file_count += child_files
+                    size += child_size
+                totals[path] = (file_count, size)
+            self._totals = totals
+        return totals.get(rel_dir, (0, 0))
+
+    def walk(self, rel_dir: str, depth: int = 1, pattern: str = None) -> Tuple[List[Tuple[str, int, int]], List[Tuple[str, int]]]:
+        """Subdirectories (path, files, bytes) and files (path, size) up to `depth` levels below rel_dir.
+
+        Paths are relative to rel_dir. Directories that are not descended into (hidden, ignored
+        or symlinked) are listed with None totals, broken symlinks and special files with None size. `pattern` is a glob matched against names, or against
+        paths when it contains a '/'.
+        """
+        def matches(path: str) -> bool:
+            return pattern is None or fnmatch(path if '/' in pattern else path.rpartition('/')[2], pattern)
+
+        # Nodes are replaced, not changed, by refresh(); file sizes may change under a file watcher
+        directories = self.directories
+        dirs = []
+        files = []
+        stack = [("", 1)]
+        while stack:
+            prefix, level = stack.pop()
+            node = directories.get(_join(rel_dir, prefix) if prefix else rel_dir)
+            if node is None:
+                continue
+            for name, size in list(node['files'].items()):
+                if matches(_join(prefix, name)):
+                    files.append((_join(prefix, name), size))
+            for name in node.get('special', ()):
+                if matches(_join(prefix, name)):
+                    files.append((_join(prefix, name), None))
+            for name in node['dirs']:
+                path = _join(prefix, name)
+                if matches(path):
+                    dirs.append((path, *self.totals(_join(rel_dir, path))))
+                if level < depth:
+                    stack.append((path, level + 1))
+            for name in node.get('listed', ()):
+                path = _join(prefix, name)
+                if matches(path):
+                    dirs.append((path, None, None))
+        return sorted(dirs), sorted(files)
+
+    def save(self, path: str):
+        os.makedirs(path, exist_ok=True)
+        tree_path = os.path.join(path, DIRECTORY_TREE_FILENAME)
+        with open(tree_path + ".tmp", "w", encoding="utf-8") as f:
+            json.dump({'version': DIRECTORY_TREE_VERSION, 'root': self.root, 'directories': self.directories}, f)
+        os.replace(tree_path + ".tmp", tree_path)
+
+    @classmethod
+    def load(cls, path: str) -> Optional["DirectoryTree"]:
+        """Load a saved snapshot, or None if there is none or it was saved in an older format"""
+        tree_path = os.path.join(path, DIRECTORY_TREE_FILENAME)
+        if not os.path.exists(tree_path):
+            return None
+
+        with open(tree_path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        if data.get('version') != DIRECTORY_TREE_VERSION:
+            return None
+
+        tree = cls(data['root'])
+        tree.directories = data['directories']
+        return tree
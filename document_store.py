@@ -0,0 +1,214 @@
+import os
+import json
+from typing import List, Dict, Optional, Iterator
+import numpy as np
+from langchain.schema import Document
+
+HEADER_FILENAME = "chunk_store.json"
+TEXTS_FILENAME = "chunk_texts.bin"
+COLUMNS_FILENAME = "chunk_columns.npy"
+
+# One fixed-width row per chunk; text lives in the blob at [offset, offset + length)
+COLUMN_DTYPE = np.dtype([
+    ('offset', 'i8'),
+    ('length', 'i4'),
+    ('file_id', 'i4'),  # -1 marks a tombstoned chunk
+    ('chunk_index', 'i4'),
+    ('total_chunks', 'i4'),
+    ('start_line', 'i4'),  # -1 when unknown
+    ('end_line', 'i4'),
+    ('start_byte', 'i8'),  # UTF-8 byte range of the chunk in its file, -1 when unknown
+    ('end_byte', 'i8'),
+])
+
+# Metadata keys stored as integer columns (everything but offset/length/file_id)
+_INT_METADATA = [name for name in COLUMN_DTYPE.names if name not in ('offset', 'length', 'file_id')]
+
+class ColumnarDocumentStore:
+    """Chunk store with an offsets table, a memory-mapped text blob and compact metadata columns.
+
+    Loading only maps the files, so start-up cost does not grow with the amount of chunk
+    text; Documents are materialized on access. Positions double as FAISS ids.
+    """
+
+    def __init__(self):
+        self._files: List[str] = []
+        self._file_ids: Dict[str, int] = {}
+        self._base_columns = np.zeros(0, dtype=COLUMN_DTYPE)
+        self._base_texts = None
+        self._base_size = 0
+        self._new_rows: List[tuple] = []
+        self._new_texts: List[bytes] = []
+        self._deleted = set()
+        self._deleted_count = 0
+
+    def __len__(self) -> int:
+        return self._base_size + len(self._new_rows)
+
+    def is_live(self, idx: int) -> bool:
+        """Whether a chunk exists and is not tombstoned, without materializing it"""
+        if idx < 0 or idx >= len(self) or idx in self._deleted:
+            return False
+        if idx < self._base_size:
+            return bool(self._base_columns[idx]['file_id'] >= 0)
+        return True
+
+    def __getitem__(self, idx: int) -> Optional[Document]:
+        """Materialize one chunk, or None if it was tombstoned"""
+        if idx < 0 or idx >= len(self):
+            raise IndexError(idx)
+        if idx in self._deleted:
+            return None
+
+        if idx < self._base_size:
+            row = self._base_columns[idx]
+            if row['file_id'] < 0:
+                return None
+            start = int(row['offset'])
+            text = bytes(self._base_texts[start:start + int(row['length'])]).decode('utf-8')
+            values = {name: int(row[name]) for name in _INT_METADATA}
+            file_id = int(row['file_id'])
+        else:
+            row = self._new_rows[idx - self._base_size]
+            text = self._new_texts[idx - self._base_size].decode('utf-8')
+            file_id = row[0]
+            values = dict(zip(_INT_METADATA, row[1:]))
+
+        file_path = self._files[file_id]
+        metadata = {
+            'file_path': file_path,
+            'file_name': os.path.basename(file_path),
+            'file_extension': os.path.splitext(file_path)[1],
+        }
+        for name, value in values.items():
+            if value >= 0:
+                metadata[name] = value
+        return Document(page_content=text, metadata=metadata)
+
+    def positions(self, idx: int) -> Optional[Dict[str, int]]:
+        """Integer metadata (chunk index, line and byte range) of a live chunk, without reading its text"""
+        if not self.is_live(idx):
+            return None
+        if idx < self._base_size:
+            row = self._base_columns[idx]
+            return {name: int(row[name]) for name in _INT_METADATA}
+        return dict(zip(_INT_METADATA, self._new_rows[idx - self._base_size][1:]))
+    
+    def __iter__(self) -> Iterator[Optional[Document]]:
+        for idx in range(len(self)):
+            yield self[idx]
+
+    @property
+    def live_count(self) -> int:
+        """Number of chunks that are not tombstoned"""
+        return len(self) - self._deleted_count
+
+    def append(self, document: Document) -> int:
+        """Add a document and return its id"""
+        metadata = document.metadata
+        file_path = str(metadata.get('file_path', ''))
+        file_id = self._file_ids.get(file_path)
+        if file_id is None:
+            file_id = len(self._files)
+            self._files.append(file_path)
+            self._file_ids[file_path] = file_id
+
+        row = (file_id,) + tuple(int(metadata.get(name, -1)) for name in _INT_METADATA)
+        self._new_rows.append(row)
+        self._new_texts.append(document.page_content.encode('utf-8'))
+        return len(self) - 1
+
+    def extend(self, documents: List[Document]):
+        for document in documents:
+            self.append(document)
+
+    def delete(self, idx: int):
+        """Tombstone a chunk; its text is dropped on the next save"""
+        if self.is_live(idx):
+            self._deleted.add(idx)
+            self._deleted_count += 1
+
+    def save(self, path: str):
+        """Write the store, compacting tombstoned text but keeping ids stable"""
+        os.makedirs(path, exist_ok=True)
+        columns = np.zeros(len(self), dtype=COLUMN_DTYPE)
+        texts_tmp = os.path.join(path, TEXTS_FILENAME + ".tmp")
+        columns_tmp = os.path.join(path, COLUMNS_FILENAME + ".tmp")
+
+        offset = 0
+        with open(texts_tmp, "wb") as f:
+            for idx in range(len(self)):
+                if idx < self._base_size:
+                    row = self._base_columns[idx]
+                    values = tuple(int(row[name]) for name in COLUMN_DTYPE.names)
+                    start = values[0]
+                    data = self._base_texts[start:start + values[1]] if values[1] else b""
+                    file_id, int_values = values[2], values[3:]
+                else:
+                    row = self._new_rows[idx - self._base_size]
+                    data = self._new_texts[idx - self._base_size]
+                    file_id, int_values = row[0], row[1:]
+
+                if idx in self._deleted or file_id < 0:
+                    columns[idx] = (offset, 0, -1) + tuple(int_values)
+                    continue
+
+                f.write(data)
+                columns[idx] = (offset, len(data), file_id) + tuple(int_values)
+                offset += len(data)
+
+        with open(columns_tmp, "wb") as f:
+            np.save(f, columns)
+
+        header = {'version': 2, 'count': len(self), 'deleted': self._deleted_count, 'files': self._files}
+        header_tmp = os.path.join(path, HEADER_FILENAME + ".tmp")
+        with open(header_tmp, "w", encoding="utf-8") as f:
+            json.dump(header, f)
+
+        # Old mappings stay valid after the files are replaced (POSIX), so readers
+        # keep working until the new ones are swapped in
+        os.replace(texts_tmp, os.path.join(path, TEXTS_FILENAME))
+        os.replace(columns_tmp, os.path.join(path, COLUMNS_FILENAME))
+        os.replace(header_tmp, os.path.join(path, HEADER_FILENAME))
+        self._open(path)
+
+    def _open(self, path: str):
+        with open(os.path.join(path, HEADER_FILENAME), "r", encoding="utf-8") as f:
+            header = json.load(f)
+
+        columns = np.load(os.path.join(path, COLUMNS_FILENAME), mmap_mode='r')
+        if columns.dtype != COLUMN_DTYPE:
+            # Older column files lack some columns: upgrade in memory (the next save writes the new layout)
+            upgraded = np.full(len(columns), -1, dtype=COLUMN_DTYPE)
+            for name in columns.dtype.names:
+                if name in COLUMN_DTYPE.names:
+                    upgraded[name] = columns[name]
+            columns = upgraded
+        texts_path = os.path.join(path, TEXTS_FILENAME)
+        if os.path.getsize(texts_path) > 0:
+            texts = np.memmap(texts_path, dtype=np.uint8, mode='r')
+        else:
+            texts = np.zeros(0, dtype=np.uint8)
+
+        # Swap in the new state with everything already mapped. The new columns cover every
+        # id below the old size, so ids stay readable at each step: mappings first, then the
+        # size, then the rows and tombstones the saved columns now hold.
+        self._files = header['files']
+        self._file_ids = {file_path: i for i, file_path in enumerate(self._files)}
+        self._base_columns, self._base_texts = columns, texts
+        self._base_size = header['count']
+        self._deleted_count = header['deleted']
+        self._new_rows = []
+        self._new_texts = []
+        self._deleted = set()
+
+    @classmethod
+    def exists(cls, path: str) -> bool:
+        return os.path.exists(os.path.join(path, HEADER_FILENAME))
+
+    @classmethod
+    def load(cls, path: str) -> "ColumnarDocumentStore":
+        """Map a saved store; chunk text is paged in lazily"""
+        store = cls()
+        store._open(path)
+        return store
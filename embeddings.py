@@ -0,0 +1,166 @@
+import time
+import hashlib
+import threading
+import weakref
+from typing import Dict, Any
+import numpy as np
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from sentence_transformers import SentenceTransformer
+from chatbortai.config import Config
+
+class FallbackEmbeddingModel:
+    """Simple fallback embedding model using basic text features"""
+
+    def __init__(self):
+        self.dimension = 128  # Fixed dimension for fallback
+
+    def encode(self, texts, **kwargs):
+        """Simple fallback encoding using basic text features"""
+        embeddings = []
+        for text in texts:
+            # Create a simple hash-based embedding
+            text_hash = hashlib.md5(text.encode()).hexdigest()
+            # Convert hash to numerical values
+            embedding = np.array([ord(c) for c in text_hash[:self.dimension]], dtype=np.float32)
+            # Normalize
+            if np.linalg.norm(embedding) > 0:
+                embedding = embedding / np.linalg.norm(embedding)
+            embeddings.append(embedding)
+
+        return np.array(embeddings)
+
+def load_embedding_model(embedding_model_name: str):
+    """Load an embedding model with retry logic and timeout handling.
+
+    Returns (model, name of the model actually loaded).
+    """
+    max_retries = 3
+    retry_delay = 5
+
+    for attempt in range(max_retries):
+        try:
+            # Configure requests session with longer timeout and retry strategy
+            session = requests.Session()
+            retry_strategy = Retry(
+                total=3,
+                backoff_factor=1,
+                status_forcelist=[429, 500, 502, 503, 504],
+            )
+            adapter = HTTPAdapter(max_retries=retry_strategy)
+            session.mount("http://", adapter)
+            session.mount("https://", adapter)
+
+            # Try to load the model with extended timeout
+            print(f"Attempting to load embedding model: {embedding_model_name} (attempt {attempt + 1}/{max_retries})")
+
+            # Use a simpler model as fallback if the main one fails
+            if attempt == 0:
+                model_name = embedding_model_name
+            else:
+                # Fallback to a smaller, faster model
+                model_name = "paraphrase-MiniLM-L3-v2"
+
+            embedding_model = SentenceTransformer(
+                model_name,
+                device='cpu',  # Force CPU to avoid GPU memory issues
+                cache_folder="./model_cache"  # Cache models locally
+            )
+
+            print(f"Successfully loaded embedding model: {model_name}")
+            return embedding_model, model_name
+
+        except Exception as e:
+            print(f"Attempt {attempt + 1} failed: {str(e)}")
+            if attempt < max_retries - 1:
+                print(f"Retrying in {retry_delay} seconds...")
+                time.sleep(retry_delay)
+                retry_delay *= 2  # Exponential backoff
+            else:
+                print("All attempts failed. Using fallback embedding method.")
+                # Create a simple fallback embedding model
+                return FallbackEmbeddingModel(), "fallback"
+
+def embedding_dimension(model) -> int:
+    """Size of the vectors a model produces"""
+    if hasattr(model, 'get_sentence_embedding_dimension'):
+        return model.get_sentence_embedding_dimension()
+    return model.dimension
+
+class EmbeddingModelRegistry:
+    """Process-wide registry that loads each embedding model once and shares it"""
+
+    def __init__(self):
+        self._models = {}
+        self._metrics = {}
+        # Requested name -> time after which a fallback loaded in its place is replaced by a new attempt
+        self._retry_at = {}
+        # Model -> name of the model actually loaded (a fallback may stand in for the requested one)
+        self._loaded_names = weakref.WeakKeyDictionary()
+        self._locks = {}
+        self._lock = threading.Lock()
+
+    def _cached(self, model_name: str):
+        """The loaded model for a name, or None if it must be (re)loaded; call with the lock held"""
+        model = self._models.get(model_name)
+        if model is None or time.monotonic() >= self._retry_at.get(model_name, float('inf')):
+            return None
+        self._metrics[model_name]['hits'] += 1
+        return model
+
+    def get(self, model_name: str = None):
+        """Return the model for a name, loading it on first use"""
+        model_name = model_name or Config.EMBEDDING_MODEL
+        with self._lock:
+            model = self._cached(model_name)
+            if model is not None:
+                return model
+            name_lock = self._locks.setdefault(model_name, threading.Lock())
+
+        # Load outside the registry lock so other models stay available meanwhile
+        with name_lock:
+            with self._lock:
+                model = self._cached(model_name)
+                if model is not None:
+                    return model
+
+            start_time = time.perf_counter()
+            model, loaded_name = load_embedding_model(model_name)
+            load_seconds = time.perf_counter() - start_time
+
+            with self._lock:
+                # A fallback is served until the retry interval has passed, so a temporary network
+                # failure neither repeats the load backoff on every call nor sticks for good
+                self._models[model_name] = model
+                self._loaded_names[model] = loaded_name
+                if loaded_name != model_name:
+                    self._retry_at[model_name] = time.monotonic() + Config.EMBEDDING_RETRY_SECONDS
+                else:
+                    self._retry_at.pop(model_name, None)
+                self._metrics[model_name] = {
+                    'loaded_model': loaded_name,
+                    'load_seconds': load_seconds,
+                    'hits': 0
+                }
+            return model
+
+    def signature(self, model) -> str:
+        """Name and dimension of the model actually loaded, for keying anything derived from its embeddings"""
+        with self._lock:
+            loaded_name = self._loaded_names.get(model, type(model).__name__)
+        return f"{loaded_name}:{embedding_dimension(model)}"
+
+    def metrics(self) -> Dict[str, Dict[str, Any]]:
+        """Load time, actually loaded model and reuse count per requested model name"""
+        with self._lock:
+            return {name: dict(values) for name, values in self._metrics.items()}
+
+    def clear(self):
+        """Forget all loaded models (e.g. to retry after a network failure)"""
+        with self._lock:
+            self._models.clear()
+            self._metrics.clear()
+            self._retry_at.clear()
+
+embedding_models = EmbeddingModelRegistry()
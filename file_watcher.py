@@ -0,0 +1,113 @@
+import os
+import time
+import threading
+from typing import Callable, Optional, Set
+from chatbortai.config import Config
+
+try:
+    from watchdog.observers import Observer
+    from watchdog.events import FileSystemEventHandler
+except ImportError:  # Optional: without watchdog the index only changes when a repository is (re)loaded
+    Observer = None
+    FileSystemEventHandler = object
+
+def watchdog_available() -> bool:
+    return Observer is not None
+
+class RepositoryWatcher(FileSystemEventHandler):
+    """Watches a repository and hands changed paths to a callback in debounced batches.
+
+    Paths are relative to the repository, '/'-separated, and may name files or directories
+    (created, deleted or moved ones). A batch is delivered once no event has arrived for
+    `debounce` seconds, so a save or a checkout touching many files costs one update.
+    """
+
+    def __init__(self, repo_path: str, on_change: Callable[[Set[str]], None], debounce: float = None):
+        self.repo_path = os.path.realpath(repo_path)
+        self.on_change = on_change
+        self.debounce = Config.WATCH_DEBOUNCE_SECONDS if debounce is None else debounce
+        self._pending: Set[str] = set()
+        self._last_event = 0.0
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stopped = threading.Event()
+        self._observer = None
+        self._worker: Optional[threading.Thread] = None
+
+    @property
+    def is_running(self) -> bool:
+        return self._worker is not None and self._worker.is_alive()
+
+    def start(self):
+        if Observer is None:
+            raise RuntimeError("File watching requires the watchdog package (pip install watchdog)")
+
+        self._stopped.clear()
+        self._observer = Observer()
+        self._observer.daemon = True
+        self._observer.schedule(self, self.repo_path, recursive=True)
+        self._observer.start()
+        self._worker = threading.Thread(target=self._deliver, daemon=True)
+        self._worker.start()
+
+    def stop(self):
+        self._stopped.set()
+        self._wake.set()
+        if self._observer is not None:
+            self._observer.stop()
+            self._observer.join(timeout=5)
+            self._observer = None
+        if self._worker is not None:
+            self._worker.join(timeout=5)
+            self._worker = None
+
+    def on_any_event(self, event):
+        # Directory mtimes change with every file event inside them; reads change nothing
+        if event.event_type not in ('created', 'modified', 'deleted', 'moved'):
+            return
+        if event.is_directory and event.event_type == 'modified':
+            return
+
+        paths = [self._relative(event.src_path), self._relative(getattr(event, 'dest_path', '') or '')]
+        paths = [path for path in paths if path]
+        if not paths:
+            return
+        with self._lock:
+            self._pending.update(paths)
+            self._last_event = time.monotonic()
+            self._wake.set()
+
+    def _relative(self, path) -> Optional[str]:
+        """Repository-relative path, or None for paths ingestion never looks at"""
+        if not path:
+            return None
+        if isinstance(path, bytes):
+            path = os.fsdecode(path)
+        rel_path = os.path.relpath(path, self.repo_path)
+        if rel_path == os.curdir or rel_path.startswith(os.pardir):
+            return None
+        parts = rel_path.split(os.sep)
+        if any(part.startswith('.') or part in Config.IGNORED_DIRECTORIES for part in parts):
+            return None
+        return '/'.join(parts)
+
+    def _deliver(self):
+        """Hand pending paths to the callback once events have been quiet for the debounce interval"""
+        while not self._stopped.is_set():
+            self._wake.wait()
+            while not self._stopped.is_set():
+                with self._lock:
+                    remaining = self._last_event + self.debounce - time.monotonic()
+                if remaining <= 0 or self._stopped.wait(remaining):
+                    break
+            if self._stopped.is_set():
+                return
+
+            with self._lock:
+                paths, self._pending = self._pending, set()
+                self._wake.clear()
+            if paths:
+                try:
+                    self.on_change(paths)
+                except Exception as e:
+                    print(f"Error applying file changes: {e}")
@@ -0,0 +1,123 @@
+import math
+import time
+from typing import List, Dict, Any
+import faiss
+import numpy as np
+from chatbortai.config import Config
+
+INDEX_TYPES = ("flat", "ivf_flat", "ivf_pq", "hnsw")
+
+# FAISS wants roughly 39 training points per centroid
+_POINTS_PER_CENTROID = 39
+
+def needs_training(index_type: str = None) -> bool:
+    """Whether an index type must be trained on a sample before vectors are added"""
+    index_type = (index_type or Config.FAISS_INDEX_TYPE).lower()
+    return index_type in ("ivf_flat", "ivf_pq")
+
+def _pq_subquantizers(dimension: int) -> int:
+    """Largest divisor of the dimension not above FAISS_PQ_M"""
+    for m in range(min(Config.FAISS_PQ_M, dimension), 0, -1):
+        if dimension % m == 0:
+            return m
+    return 1
+
+def faiss_metric(metric: str = None) -> int:
+    """FAISS metric for a VECTOR_METRIC setting (cosine = inner product on normalized vectors)"""
+    metric = (metric or Config.VECTOR_METRIC).lower()
+    if metric == "cosine":
+        return faiss.METRIC_INNER_PRODUCT
+    if metric == "l2":
+        return faiss.METRIC_L2
+    raise ValueError(f"Unknown vector metric: {metric}. Choose from cosine, l2")
+
+def _flat_index(dimension: int, metric: int):
+    if metric == faiss.METRIC_INNER_PRODUCT:
+        return faiss.IndexFlatIP(dimension)
+    return faiss.IndexFlatL2(dimension)
+
+def create_index(dimension: int, index_type: str = None, training_vectors: np.ndarray = None,
+                 metric: str = None):
+    """Create an empty FAISS index whose ids are assigned by the caller"""
+    index_type = (index_type or Config.FAISS_INDEX_TYPE).lower()
+    metric_type = faiss_metric(metric)
+    if index_type not in INDEX_TYPES:
+        raise ValueError(f"Unknown FAISS index type: {index_type}. Choose from {', '.join(INDEX_TYPES)}")
+
+    n_train = 0 if training_vectors is None else len(training_vectors)
+
+    if index_type == "hnsw":
+        index = faiss.IndexHNSWFlat(dimension, Config.FAISS_HNSW_M, metric_type)
+        index.hnsw.efConstruction = Config.FAISS_HNSW_EF_CONSTRUCTION
+        return faiss.IndexIDMap(index)
+
+    if index_type in ("ivf_flat", "ivf_pq"):
+        nlist = min(Config.FAISS_NLIST, n_train // _POINTS_PER_CENTROID)
+        nbits = min(8, int(math.log2(max(n_train // _POINTS_PER_CENTROID, 1))))
+        # Too few vectors to train a useful quantizer: an exact scan is fast at this size anyway
+        if nlist < 2 or (index_type == "ivf_pq" and nbits < 4):
+            print(f"Only {n_train} vectors, using a flat index instead of {index_type}")
+            return faiss.IndexIDMap(_flat_index(dimension, metric_type))
+
+        quantizer = _flat_index(dimension, metric_type)
+        if index_type == "ivf_flat":
+            index = faiss.IndexIVFFlat(quantizer, dimension, nlist, metric_type)
+        else:
+            index = faiss.IndexIVFPQ(quantizer, dimension, nlist, _pq_subquantizers(dimension), nbits, metric_type)
+
+        print(f"Training {index_type} index (nlist={nlist}) on {n_train} vectors")
+        index.train(np.ascontiguousarray(training_vectors, dtype='float32'))
+        return faiss.IndexIDMap(index)
+
+    return faiss.IndexIDMap(_flat_index(dimension, metric_type))
+
+def set_search_parameters(index, nprobe: int = None, ef_search: int = None):
+    """Apply query-time knobs (nprobe for IVF, efSearch for HNSW) where supported"""
+    if index is None:
+        return
+
+    inner = faiss.downcast_index(index.index) if isinstance(index, faiss.IndexIDMap) else index
+    params = faiss.ParameterSpace()
+    if isinstance(inner, faiss.IndexIVF):
+        params.set_index_parameter(index, "nprobe", nprobe or Config.FAISS_NPROBE)
+    elif isinstance(inner, faiss.IndexHNSW):
+        params.set_index_parameter(index, "efSearch", ef_search or Config.FAISS_EF_SEARCH)
+
+def evaluate_index_types(embeddings: np.ndarray, queries: np.ndarray, k: int = 10,
+                         index_types: List[str] = None) -> List[Dict[str, Any]]:
+    """Measure recall@k and per-query latency of each index type against the exact flat index"""
+    index_types = index_types or list(INDEX_TYPES)
+    embeddings = np.ascontiguousarray(embeddings, dtype='float32')
+    queries = np.ascontiguousarray(queries, dtype='float32')
+    if faiss_metric() == faiss.METRIC_INNER_PRODUCT:
+        faiss.normalize_L2(embeddings)
+        faiss.normalize_L2(queries)
+    ids = np.arange(len(embeddings), dtype='int64')
+    dimension = embeddings.shape[1]
+
+    exact = create_index(dimension, "flat")
+    exact.add_with_ids(embeddings, ids)
+    _, truth = exact.search(queries, k)
+
+    results = []
+    for index_type in index_types:
+        start = time.perf_counter()
+        training = embeddings[:Config.FAISS_TRAIN_SIZE] if needs_training(index_type) else None
+        index = create_index(dimension, index_type, training)
+        index.add_with_ids(embeddings, ids)
+        build_seconds = time.perf_counter() - start
+
+        set_search_parameters(index)
+        start = time.perf_counter()
+        _, found = index.search(queries, k)
+        query_ms = (time.perf_counter() - start) * 1000 / max(len(queries), 1)
+
+        hits = sum(len(set(truth[i]) & set(found[i])) for i in range(len(queries)))
+        results.append({
+            'index_type': index_type,
+            'recall': hits / float(truth.size) if truth.size else 0.0,
+            'query_ms': query_ms,
+            'build_seconds': build_seconds
+        })
+
+    return results
@@ -0,0 +1,300 @@
+import os
+import re
+import json
+import math
+import bisect
+from collections import Counter
+from typing import List, Dict, Tuple, Any, Optional
+import numpy as np
+from chatbortai.config import Config
+
+LEXICAL_INDEX_FILENAME = "lexical_index.json"
+TERM_TEXT_FILENAME = "lexical_terms.bin"
+TERMS_FILENAME = "lexical_terms.npy"
+POSTINGS_FILENAME = "lexical_postings.npy"
+LENGTHS_FILENAME = "lexical_lengths.npy"
+LEXICAL_INDEX_VERSION = 2
+
+# Row i covers term i: its text is blob[term[i]:term[i + 1]], its postings rows [posting[i], posting[i + 1])
+TERM_DTYPE = np.dtype([('term', 'i8'), ('posting', 'i8')])
+POSTING_DTYPE = np.dtype([('doc_id', 'i4'), ('tf', 'i4')])
+_NO_POSTINGS = (np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64))
+
+_WORD_PATTERN = re.compile(r"[A-Za-z0-9_]+")
+# Splits camelCase / PascalCase / HTTPServer-style words into their parts
+_CAMEL_PATTERN = re.compile(r"[A-Z]+(?=[A-Z][a-z])|[A-Z]?[a-z]+|[A-Z]+|\d+")
+
+def tokenize_code(text: str) -> List[str]:
+    """Lower-cased tokens for code: each identifier whole plus its camelCase/snake_case parts"""
+    tokens = []
+    for word in _WORD_PATTERN.findall(text):
+        tokens.append(word.lower())
+        parts = [part.lower() for piece in word.split('_') for part in _CAMEL_PATTERN.findall(piece)]
+        if len(parts) > 1:
+            tokens.extend(parts)
+    return tokens
+
+class _TermList:
+    """Sorted terms of a saved index, decoded from the mapped blob on access (for bisect)"""
+
+    def __init__(self, blob, offsets):
+        self._blob = blob
+        self._offsets = offsets
+
+    def __len__(self) -> int:
+        return len(self._offsets) - 1
+
+    def __getitem__(self, i: int) -> str:
+        return bytes(self._blob[self._offsets[i]:self._offsets[i + 1]]).decode('utf-8')
+
+class BM25Index:
+    """Inverted index over chunk ids with BM25 scoring, maintained incrementally.
+
+    A saved index is a sorted term blob plus numpy arrays of term offsets, (id, tf) postings
+    grouped by term and per-id lengths, memory-mapped on first use. Chunks added since are
+    held in in-memory postings; removed ones are skipped until the next save merges both.
+    """
+
+    def __init__(self, k1: float = None, b: float = None):
+        self.k1 = k1 if k1 is not None else Config.BM25_K1
+        self.b = b if b is not None else Config.BM25_B
+        # Chunks added since the last save
+        self.postings: Dict[str, Dict[int, int]] = {}
+        self.doc_lengths: Dict[int, int] = {}
+        self.total_length = 0
+        # Added ids removed since, whose postings are still in self.postings
+        self._stale = set()
+        # Saved index: mapped lazily from _path; ids removed (or re-added) since are in _removed
+        self._path = None
+        self._base = None
+        self._base_count = 0
+        self._removed = set()
+        self._dirty = True
+
+    def __len__(self) -> int:
+        return self._base_count - len(self._removed) + len(self.doc_lengths)
+
+    def _mapped(self) -> Optional[Dict[str, Any]]:
+        """Arrays of the saved index, mapped on first use"""
+        if self._base is None and self._path is not None:
+            offsets = np.load(os.path.join(self._path, TERMS_FILENAME), mmap_mode='r')
+            terms_path = os.path.join(self._path, TERM_TEXT_FILENAME)
+            if os.path.getsize(terms_path) > 0:
+                blob = np.memmap(terms_path, dtype=np.uint8, mode='r')
+            else:
+                blob = np.zeros(0, dtype=np.uint8)
+            self._base = {
+                'terms': _TermList(blob, offsets['term']),
+                'starts': offsets['posting'],
+                'postings': np.load(os.path.join(self._path, POSTINGS_FILENAME), mmap_mode='r'),
+                'lengths': np.load(os.path.join(self._path, LENGTHS_FILENAME), mmap_mode='r'),
+            }
+        return self._base
+
+    def _base_length(self, doc_id: int) -> Optional[int]:
+        base = self._mapped()
+        if base is None or doc_id in self._removed or not 0 <= doc_id < len(base['lengths']):
+            return None
+        length = int(base['lengths'][doc_id])
+        return length if length >= 0 else None
+
+    def _base_postings(self, term: str) -> Tuple[np.ndarray, np.ndarray]:
+        """Ids and term frequencies of a term in the saved index, without removed ids"""
+        base = self._mapped()
+        if base is None:
+            return _NO_POSTINGS
+        terms = base['terms']
+        i = bisect.bisect_left(terms, term)
+        if i == len(terms) or terms[i] != term:
+            return _NO_POSTINGS
+        postings = base['postings'][base['starts'][i]:base['starts'][i + 1]]
+        doc_ids, tfs = postings['doc_id'], postings['tf']
+        if self._removed:
+            keep = ~np.isin(doc_ids, np.fromiter(self._removed, dtype=np.int64))
+            doc_ids, tfs = doc_ids[keep], tfs[keep]
+        return doc_ids, tfs
+
+    def add(self, doc_id: int, text: str):
+        """Index one chunk under its id"""
+        self.remove(doc_id)
+        if doc_id in self._stale:
+            self._stale.discard(doc_id)
+            for docs in self.postings.values():
+                docs.pop(doc_id, None)
+
+        counts = Counter(tokenize_code(text))
+        for term, tf in counts.items():
+            self.postings.setdefault(term, {})[doc_id] = tf
+        length = sum(counts.values())
+        self.doc_lengths[doc_id] = length
+        self.total_length += length
+        self._dirty = True
+
+    def remove(self, doc_id: int):
+        length = self.doc_lengths.pop(doc_id, None)
+        if length is not None:
+            self._stale.add(doc_id)
+        else:
+            length = self._base_length(doc_id)
+            if length is None:
+                return
+            self._removed.add(doc_id)
+        self.total_length -= length
+        self._dirty = True
+
+    def search(self, query: str, k: int = 5) -> List[Tuple[int, float]]:
+        """Return (id, BM25 score) pairs, best first"""
+        n_docs = len(self)
+        if not n_docs:
+            return []
+
+        avg_length = self.total_length / n_docs or 1.0
+        base = self._mapped()
+        doc_ids = []
+        scores = []
+        for term in set(tokenize_code(query)):
+            base_ids, base_tfs = self._base_postings(term)
+            added = [(doc_id, tf) for doc_id, tf in self.postings.get(term, {}).items()
+                     if doc_id in self.doc_lengths]
+            if not len(base_ids) and not added:
+                continue
+            ids = np.concatenate([base_ids.astype(np.int64), np.array([doc_id for doc_id, _ in added], dtype=np.int64)])
+            tfs = np.concatenate([base_tfs.astype(np.float64), np.array([tf for _, tf in added], dtype=np.float64)])
+            lengths = np.concatenate([base['lengths'][base_ids] if base is not None else np.zeros(0),
+                                      np.array([self.doc_lengths[doc_id] for doc_id, _ in added], dtype=np.float64)])
+            idf = math.log(1 + (n_docs - len(ids) + 0.5) / (len(ids) + 0.5))
+            norm = self.k1 * (1 - self.b + self.b * lengths / avg_length)
+            doc_ids.append(ids)
+            scores.append(idf * tfs * (self.k1 + 1) / (tfs + norm))
+
+        if not doc_ids:
+            return []
+        ids, inverse = np.unique(np.concatenate(doc_ids), return_inverse=True)
+        totals = np.bincount(inverse, weights=np.concatenate(scores))
+        order = np.lexsort((ids, -totals))[:k]
+        return [(int(ids[i]), float(totals[i])) for i in order]
+
+    def save(self, path: str):
+        """Write the index, merging added chunks and dropping postings of removed ones.
+
+        Nothing is written when the index has not changed since it was loaded from or saved to `path`.
+        """
+        if not self._dirty and self._path == path and os.path.exists(os.path.join(path, LEXICAL_INDEX_FILENAME)):
+            return
+        os.makedirs(path, exist_ok=True)
+
+        # Live postings as (term, id, tf) columns: the saved ones, then those added since
+        terms = []
+        term_ids = []
+        doc_ids = []
+        tfs = []
+        base = self._mapped()
+        if base is not None:
+            base_terms = base['terms']
+            terms = [base_terms[i] for i in range(len(base_terms))]
+            base_term_ids = np.repeat(np.arange(len(terms), dtype=np.int64), np.diff(base['starts']))
+            base_doc_ids = np.asarray(base['postings']['doc_id'], dtype=np.int64)
+            keep = ~np.isin(base_doc_ids, np.fromiter(self._removed, dtype=np.int64))
+            term_ids.append(base_term_ids[keep])
+            doc_ids.append(base_doc_ids[keep])
+            tfs.append(np.asarray(base['postings']['tf'], dtype=np.int64)[keep])
+        term_numbers = {term: i for i, term in enumerate(terms)}
+        for term, docs in self.postings.items():
+            live = [(doc_id, tf) for doc_id, tf in docs.items() if doc_id in self.doc_lengths]
+            if not live:
+                continue
+            if term not in term_numbers:
+                term_numbers[term] = len(terms)
+                terms.append(term)
+            term_ids.append(np.full(len(live), term_numbers[term], dtype=np.int64))
+            doc_ids.append(np.array([doc_id for doc_id, _ in live], dtype=np.int64))
+            tfs.append(np.array([tf for _, tf in live], dtype=np.int64))
+        term_ids = np.concatenate(term_ids) if term_ids else np.zeros(0, dtype=np.int64)
+        doc_ids = np.concatenate(doc_ids) if doc_ids else np.zeros(0, dtype=np.int64)
+        tfs = np.concatenate(tfs) if tfs else np.zeros(0, dtype=np.int64)
+
+        # Renumber terms in sorted order, leaving out terms without live postings
+        counts = np.bincount(term_ids, minlength=len(terms))
+        used = sorted((term for i, term in enumerate(terms) if counts[i]))
+        renumber = np.full(len(terms), -1, dtype=np.int64)
+        for i, term in enumerate(used):
+            renumber[term_numbers[term]] = i
+        term_ids = renumber[term_ids]
+        order = np.lexsort((doc_ids, term_ids))
+        postings = np.zeros(len(order), dtype=POSTING_DTYPE)
+        postings['doc_id'] = doc_ids[order]
+        postings['tf'] = tfs[order]
+
+        encoded = [term.encode('utf-8') for term in used]
+        offsets = np.zeros(len(used) + 1, dtype=TERM_DTYPE)
+        offsets['term'][1:] = np.cumsum([len(term) for term in encoded])
+        offsets['posting'][1:] = np.cumsum(np.bincount(term_ids, minlength=len(used)))
+
+        # Per-id lengths; -1 marks ids that are not indexed
+        lengths = np.full(0, -1, dtype=np.int32)
+        if base is not None:
+            lengths = np.array(base['lengths'], dtype=np.int32)
+            if self._removed:
+                lengths[[doc_id for doc_id in self._removed if doc_id < len(lengths)]] = -1
+        if self.doc_lengths:
+            size = max(len(lengths), max(self.doc_lengths) + 1)
+            lengths = np.concatenate([lengths, np.full(size - len(lengths), -1, dtype=np.int32)])
+            for doc_id, length in self.doc_lengths.items():
+                lengths[doc_id] = length
+
+        header = {'version': LEXICAL_INDEX_VERSION, 'k1': self.k1, 'b': self.b,
+                  'documents': len(self), 'total_length': self.total_length}
+        written = []
+        for filename, write in [(TERM_TEXT_FILENAME, lambda f: f.write(b"".join(encoded))),
+                                (TERMS_FILENAME, lambda f: np.save(f, offsets)),
+                                (POSTINGS_FILENAME, lambda f: np.save(f, postings)),
+                                (LENGTHS_FILENAME, lambda f: np.save(f, lengths))]:
+            with open(os.path.join(path, filename + ".tmp"), "wb") as f:
+                write(f)
+            written.append(filename)
+        with open(os.path.join(path, LEXICAL_INDEX_FILENAME + ".tmp"), "w", encoding="utf-8") as f:
+            json.dump(header, f)
+        written.append(LEXICAL_INDEX_FILENAME)
+        # The header goes last, so it only ever describes complete arrays
+        for filename in written:
+            os.replace(os.path.join(path, filename + ".tmp"), os.path.join(path, filename))
+        self._open(path, header)
+
+    def _open(self, path: str, header: Dict[str, Any]):
+        self.k1 = header['k1']
+        self.b = header['b']
+        self.postings = {}
+        self.doc_lengths = {}
+        self.total_length = header['total_length']
+        self._stale = set()
+        self._path = path
+        self._base = None
+        self._base_count = header['documents']
+        self._removed = set()
+        self._dirty = False
+
+    @classmethod
+    def load(cls, path: str):
+        """Load a saved index (its arrays are mapped on first search), or None if there is none"""
+        index_path = os.path.join(path, LEXICAL_INDEX_FILENAME)
+        if not os.path.exists(index_path):
+            return None
+
+        with open(index_path, "r", encoding="utf-8") as f:
+            header = json.load(f)
+        # Indexes saved as one JSON document are rebuilt from the chunks
+        if header.get('version') != LEXICAL_INDEX_VERSION:
+            return None
+
+        index = cls()
+        index._open(path, header)
+        return index
+
+def reciprocal_rank_fusion(rankings: List[List[int]], k: int = None) -> List[Tuple[int, float]]:
+    """Fuse ranked id lists: each id scores sum(1 / (k + rank)) over the lists it appears in"""
+    k = k if k is not None else Config.HYBRID_RRF_K
+    scores = {}
+    for ranking in rankings:
+        for rank, doc_id in enumerate(ranking, start=1):
+            scores[doc_id] = scores.get(doc_id, 0.0) + 1.0 / (k + rank)
+    return sorted(scores.items(), key=lambda item: (-item[1], item[0]))
@@ -0,0 +1,69 @@
+import os
+import json
+import hashlib
+from typing import Dict, List, Any, Optional
+
+MANIFEST_FILENAME = "manifest.json"
+
+def hash_content(data: bytes) -> str:
+    """Return the content hash used to detect modified files."""
+    return hashlib.sha1(data).hexdigest()
+
+def entry_matches_stat(entry: Optional[Dict[str, Any]], stat_result: os.stat_result) -> bool:
+    """Cheap check: same size and mtime means the file was not touched"""
+    if entry is None:
+        return False
+    return entry['size'] == stat_result.st_size and entry['mtime_ns'] == stat_result.st_mtime_ns
+
+class FileManifest:
+    """Per-file record of what is currently indexed in a vector store"""
+
+    def __init__(self, repo_root: str = None):
+        self.repo_root = repo_root
+        # Relative path -> {'size', 'mtime_ns', 'hash', 'chunk_ids'}
+        self.files: Dict[str, Dict[str, Any]] = {}
+
+    def get(self, rel_path: str) -> Optional[Dict[str, Any]]:
+        """Return the manifest entry for a file, if it is indexed"""
+        return self.files.get(rel_path)
+
+    def set(self, rel_path: str, size: int, mtime_ns: int, content_hash: Optional[str], chunk_ids: List[int]):
+        """Record the indexed state of a file"""
+        self.files[rel_path] = {
+            'size': size,
+            'mtime_ns': mtime_ns,
+            'hash': content_hash,
+            'chunk_ids': list(chunk_ids)
+        }
+
+    def remove(self, rel_path: str) -> Optional[Dict[str, Any]]:
+        """Drop a file from the manifest and return its previous entry"""
+        return self.files.pop(rel_path, None)
+
+    def is_unchanged(self, rel_path: str, stat_result: os.stat_result) -> bool:
+        """Cheap check: same size and mtime means the file was not touched"""
+        return entry_matches_stat(self.files.get(rel_path), stat_result)
+
+    def removed_files(self, current_files) -> List[str]:
+        """Return indexed files that no longer exist in the repository"""
+        return [rel_path for rel_path in self.files if rel_path not in current_files]
+
+    def save(self, path: str):
+        """Save manifest to disk"""
+        os.makedirs(path, exist_ok=True)
+        with open(os.path.join(path, MANIFEST_FILENAME), "w", encoding="utf-8") as f:
+            json.dump({'repo_root': self.repo_root, 'files': self.files}, f)
+
+    @classmethod
+    def load(cls, path: str) -> Optional["FileManifest"]:
+        """Load manifest from disk, or None if the store has no manifest"""
+        manifest_path = os.path.join(path, MANIFEST_FILENAME)
+        if not os.path.exists(manifest_path):
+            return None
+
+        with open(manifest_path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+
+        manifest = cls(data.get('repo_root'))
+        manifest.files = data.get('files', {})
+        return manifest
@@ -0,0 +1,118 @@
+import os
+import atexit
+import pickle
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Hashable
+from chatbortai.config import Config
+
+def normalize_query(query: str) -> str:
+    """Canonical form of a query so trivially different spellings share cache entries"""
+    return " ".join(query.lower().split())
+
+class LRUCache:
+    """Bounded, thread-safe LRU mapping with hit/miss counters"""
+
+    def __init__(self, max_size: int):
+        self.max_size = max_size
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            if key in self._data:
+                self._data.move_to_end(key)
+                self.hits += 1
+                return self._data[key]
+            self.misses += 1
+            return default
+
+    def put(self, key: Hashable, value: Any):
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_size:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def items(self):
+        with self._lock:
+            return list(self._data.items())
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def stats(self) -> Dict[str, Any]:
+        total = self.hits + self.misses
+        return {
+            'size': len(self._data),
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / total if total else 0.0
+        }
+
+class QueryCache:
+    """Query embeddings and top-k results shared by every store and search tool in the process.
+
+    Embeddings are keyed by (model signature, normalized query) and can be persisted to
+    QUERY_CACHE_PATH. Results are keyed by the store's index version, so any change to an
+    index makes its old entries unreachable.
+    """
+
+    def __init__(self, max_size: int = None, path: str = None):
+        max_size = max_size or Config.QUERY_CACHE_SIZE
+        self.path = path if path is not None else Config.QUERY_CACHE_PATH
+        self.embeddings = LRUCache(max_size)
+        self.results = LRUCache(max_size)
+        self._loaded = False
+
+    def get_embedding(self, model_name: str, query: str):
+        self._load_once()
+        return self.embeddings.get((model_name, normalize_query(query)))
+
+    def put_embedding(self, model_name: str, query: str, embedding):
+        self.embeddings.put((model_name, normalize_query(query)), embedding)
+
+    def get_results(self, index_version: str, query: str, k: int, score_threshold: float = None):
+        return self.results.get((index_version, normalize_query(query), k, score_threshold))
+
+    def put_results(self, index_version: str, query: str, k: int, score_threshold: float, results):
+        self.results.put((index_version, normalize_query(query), k, score_threshold), results)
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        return {'embeddings': self.embeddings.stats(), 'results': self.results.stats()}
+
+    def _load_once(self):
+        if self._loaded:
+            return
+        self._loaded = True
+        if not self.path or not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, "rb") as f:
+                for key, embedding in pickle.load(f):
+                    self.embeddings.put(key, embedding)
+        except Exception as e:
+            print(f"Could not load query cache from {self.path}: {e}")
+
+    def save(self):
+        """Persist query embeddings (results depend on in-memory index versions and are not saved)"""
+        if not self.path:
+            return
+        try:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            with open(self.path + ".tmp", "wb") as f:
+                pickle.dump(self.embeddings.items(), f)
+            os.replace(self.path + ".tmp", self.path)
+        except Exception as e:
+            print(f"Could not save query cache to {self.path}: {e}")
+
+query_cache = QueryCache()
+atexit.register(query_cache.save)
@@ -0,0 +1,125 @@
+import os
+import json
+from collections import Counter
+from typing import Dict, List, Any, Optional
+
+STATISTICS_FILENAME = "statistics.json"
+
+# Entries kept in the ranked lists of the summary
+TOP_N = 15
+
+LANGUAGES = {
+    '.py': 'Python', '.js': 'JavaScript', '.ts': 'TypeScript', '.java': 'Java',
+    '.cpp': 'C++', '.hpp': 'C++', '.c': 'C', '.h': 'C', '.cs': 'C#', '.php': 'PHP',
+    '.rb': 'Ruby', '.go': 'Go', '.rs': 'Rust', '.swift': 'Swift', '.kt': 'Kotlin',
+    '.scala': 'Scala', '.r': 'R', '.m': 'Objective-C', '.mm': 'Objective-C',
+    '.sh': 'Shell', '.bash': 'Shell', '.zsh': 'Shell', '.sql': 'SQL', '.html': 'HTML',
+    '.css': 'CSS', '.scss': 'CSS', '.sass': 'CSS', '.xml': 'XML', '.json': 'JSON',
+    '.yaml': 'YAML', '.yml': 'YAML', '.toml': 'TOML', '.ini': 'Config', '.cfg': 'Config',
+    '.md': 'Markdown', '.txt': 'Text', '.rst': 'reStructuredText', '.tex': 'TeX'
+}
+
+def file_statistics(file_path: str, size: int, content: str = None,
+                    symbols: Dict[str, Any] = None) -> Dict[str, Any]:
+    """Counts for one file: language, size, lines, functions, classes and imported modules.
+
+    `symbols` is the file's symbol table entry; files without one (not Python, or not
+    read because they are too large) count no definitions or imports.
+    """
+    extension = os.path.splitext(str(file_path))[1]
+    lines = content.splitlines() if content else []
+    definitions = symbols['symbols'] if symbols else []
+    imports = symbols['imports'] if symbols else []
+    return {
+        'language': LANGUAGES.get(extension, extension or 'Other'),
+        'bytes': size,
+        'lines': len(lines),
+        'loc': sum(1 for line in lines if line.strip()),
+        'functions': sum(1 for symbol in definitions if symbol['kind'] != 'class'),
+        'classes': sum(1 for symbol in definitions if symbol['kind'] == 'class'),
+        'imports': len(imports),
+        # Top-level modules, once per file (relative imports have no top-level name)
+        'modules': sorted({name.split('.')[0] for name in imports if name.split('.')[0]})
+    }
+
+def _top(counts: Dict[str, int]) -> List[List[Any]]:
+    ranked = sorted(((name, count) for name, count in counts.items() if count), key=lambda item: (-item[1], item[0]))
+    return [[name, count] for name, count in ranked[:TOP_N]]
+
+class RepositoryStatistics:
+    """Per-file counts of an indexed repository and the repo-wide summary derived from them.
+
+    Files are updated incrementally as the index is refreshed; the summary is rebuilt
+    lazily after updates and saved with the table, so reading it is constant-time.
+    """
+
+    def __init__(self):
+        # Relative path -> file_statistics()
+        self.files: Dict[str, Dict[str, Any]] = {}
+        self._summary: Optional[Dict[str, Any]] = None
+        self._dirty = True
+
+    def __contains__(self, rel_path: str) -> bool:
+        return rel_path in self.files
+
+    def set_file(self, rel_path: str, statistics: Dict[str, Any]):
+        self.files[rel_path] = statistics
+        self._dirty = True
+
+    def remove_file(self, rel_path: str):
+        if self.files.pop(rel_path, None) is not None:
+            self._dirty = True
+
+    @property
+    def summary(self) -> Dict[str, Any]:
+        """Repository totals, per-language counts and top-N rankings"""
+        summary = self._summary
+        if self._dirty or summary is None:
+            # Cleared before building so updates made meanwhile (by a file watcher) trigger another rebuild
+            self._dirty = False
+            summary = self._summary = self._build_summary(dict(self.files))
+        return summary
+
+    def _build_summary(self, files: Dict[str, Dict[str, Any]]) -> Dict[str, Any]:
+        totals = Counter()
+        languages = {}
+        modules = Counter()
+        for stats in files.values():
+            totals.update({key: stats[key] for key in ('bytes', 'lines', 'loc', 'functions', 'classes', 'imports')})
+            language = languages.setdefault(stats['language'], {'files': 0, 'loc': 0})
+            language['files'] += 1
+            language['loc'] += stats['loc']
+            modules.update(stats['modules'])
+
+        summary = {'files': len(files)}
+        summary.update({key: totals[key] for key in ('bytes', 'lines', 'loc', 'functions', 'classes', 'imports')})
+        summary['unique_modules'] = len(modules)
+        summary['languages'] = dict(sorted(languages.items(), key=lambda item: (-item[1]['loc'], item[0])))
+        summary['largest_files'] = _top({path: stats['bytes'] for path, stats in files.items()})
+        summary['most_functions'] = _top({path: stats['functions'] for path, stats in files.items()})
+        summary['most_classes'] = _top({path: stats['classes'] for path, stats in files.items()})
+        summary['most_imported'] = _top(modules)
+        return summary
+
+    def save(self, path: str):
+        os.makedirs(path, exist_ok=True)
+        statistics_path = os.path.join(path, STATISTICS_FILENAME)
+        with open(statistics_path + ".tmp", "w", encoding="utf-8") as f:
+            json.dump({'version': 1, 'files': self.files, 'summary': self.summary}, f)
+        os.replace(statistics_path + ".tmp", statistics_path)
+
+    @classmethod
+    def load(cls, path: str) -> Optional["RepositoryStatistics"]:
+        """Load saved statistics, or None if there are none"""
+        statistics_path = os.path.join(path, STATISTICS_FILENAME)
+        if not os.path.exists(statistics_path):
+            return None
+
+        with open(statistics_path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+
+        statistics = cls()
+        statistics.files = data['files']
+        statistics._summary = data.get('summary')
+        statistics._dirty = statistics._summary is None
+        return statistics
@@ -0,0 +1,151 @@
+import os
+import re
+import json
+import hashlib
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Optional, Dict, Any
+from chatbortai.config import Config
+
+REPOSITORY_INFO_FILENAME = "repository.json"
+
+def _find_git_dir(repo_path: str) -> Optional[str]:
+    """Return the .git directory of a repository (following worktree/submodule links)"""
+    git_path = os.path.join(repo_path, ".git")
+    if os.path.isdir(git_path):
+        return git_path
+
+    # Worktrees and submodules use a ".git" file pointing at the real git dir
+    if os.path.isfile(git_path):
+        try:
+            with open(git_path, "r", encoding="utf-8") as f:
+                content = f.read().strip()
+        except OSError:
+            return None
+        if content.startswith("gitdir:"):
+            git_dir = content[len("gitdir:"):].strip()
+            return os.path.normpath(os.path.join(repo_path, git_dir))
+
+    return None
+
+def get_git_head(repo_path: str) -> Optional[str]:
+    """Return the commit HEAD points to, or None if the path is not a git checkout"""
+    git_dir = _find_git_dir(repo_path)
+    if git_dir is None:
+        return None
+
+    try:
+        with open(os.path.join(git_dir, "HEAD"), "r", encoding="utf-8") as f:
+            head = f.read().strip()
+    except OSError:
+        return None
+
+    if not head.startswith("ref:"):
+        return head  # Detached HEAD
+
+    ref = head[len("ref:"):].strip()
+
+    # Worktrees keep refs in the main repository's git dir
+    common_dir = git_dir
+    commondir_path = os.path.join(git_dir, "commondir")
+    if os.path.exists(commondir_path):
+        with open(commondir_path, "r", encoding="utf-8") as f:
+            common_dir = os.path.normpath(os.path.join(git_dir, f.read().strip()))
+
+    for base in (git_dir, common_dir):
+        ref_path = os.path.join(base, ref)
+        if os.path.exists(ref_path):
+            with open(ref_path, "r", encoding="utf-8") as f:
+                return f.read().strip()
+
+    # Fall back to packed refs
+    packed_refs_path = os.path.join(common_dir, "packed-refs")
+    if os.path.exists(packed_refs_path):
+        with open(packed_refs_path, "r", encoding="utf-8") as f:
+            for line in f:
+                parts = line.strip().split(" ")
+                if len(parts) == 2 and parts[1] == ref:
+                    return parts[0]
+
+    return None
+
+class RepositoryIdentity:
+    """Stable identity of a repository: canonical path plus git HEAD when available"""
+
+    def __init__(self, repo_path: str):
+        self.repo_path = os.path.realpath(os.path.abspath(repo_path))
+        self.git_head = get_git_head(self.repo_path)
+
+    @property
+    def key(self) -> str:
+        """Namespace key; HEAD is left out so a new commit refreshes the index instead of rebuilding it"""
+        digest = hashlib.sha1(self.repo_path.encode("utf-8")).hexdigest()[:12]
+        slug = re.sub(r"[^A-Za-z0-9_.-]+", "_", os.path.basename(self.repo_path)) or "repo"
+        return f"{slug}-{digest}"
+
+    @property
+    def vector_store_path(self) -> str:
+        """Directory holding this repository's vector store"""
+        return os.path.join(Config.VECTOR_STORE_PATH, "repos", self.key)
+
+    def __str__(self) -> str:
+        if self.git_head:
+            return f"{self.repo_path}@{self.git_head[:12]}"
+        return self.repo_path
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"repo_path": self.repo_path, "git_head": self.git_head}
+
+    def save(self, path: str):
+        """Record which repository (and commit) a vector store was built from"""
+        os.makedirs(path, exist_ok=True)
+        with open(os.path.join(path, REPOSITORY_INFO_FILENAME), "w", encoding="utf-8") as f:
+            json.dump(self.to_dict(), f)
+
+class VectorStoreCache:
+    """Thread-safe LRU of loaded vector stores, keyed by repository namespace"""
+
+    def __init__(self, max_size: int = None):
+        self.max_size = max_size or Config.VECTOR_STORE_CACHE_SIZE
+        self._stores = OrderedDict()
+        # Key -> [lock, users]; entries are dropped when their last user is done
+        self._locks = {}
+        self._lock = threading.Lock()
+
+    def get(self, key: str):
+        """Return a cached store and mark it most recently used"""
+        with self._lock:
+            store = self._stores.get(key)
+            if store is not None:
+                self._stores.move_to_end(key)
+            return store
+
+    def put(self, key: str, store):
+        """Cache a store, evicting the least recently used one if full"""
+        with self._lock:
+            self._stores[key] = store
+            self._stores.move_to_end(key)
+            while len(self._stores) > self.max_size:
+                self._stores.popitem(last=False)
+
+    @contextmanager
+    def lock_for(self, key: str):
+        """Hold the lock serializing refreshes of one repository's store"""
+        with self._lock:
+            entry = self._locks.setdefault(key, [threading.Lock(), 0])
+            entry[1] += 1
+        try:
+            with entry[0]:
+                yield
+        finally:
+            with self._lock:
+                entry[1] -= 1
+                if entry[1] == 0:
+                    del self._locks[key]
+
+    def __len__(self) -> int:
+        return len(self._stores)
+
+# Shared by every CodePalManager in the process (e.g. all Streamlit sessions)
+vector_store_cache = VectorStoreCache()
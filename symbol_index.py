@@ -0,0 +1,127 @@
+import os
+import json
+import bisect
+from pathlib import Path
+from typing import List, Dict, Any, Optional
+from chatbortai.code_analysis import analyze_source
+
+SYMBOLS_FILENAME = "symbols.json"
+
+def extract_symbols(source: str, file_path: str) -> Dict[str, Any]:
+    """Functions, methods and classes (with qualified names) and imports of one Python file"""
+    analysis = analyze_source(source, file_path)
+    definitions = [(cls, 'class') for cls in analysis['classes']]
+    definitions += [(func, 'method' if func['parent_class'] else 'function') for func in analysis['functions']]
+    definitions.sort(key=lambda item: item[0]['lineno'])
+
+    symbols = [{
+        'name': info['name'],
+        'qualified_name': info['qualified_name'],
+        'kind': kind,
+        'file_path': file_path,
+        'start_line': info['lineno'],
+        'end_line': info['end_lineno'],
+        'signature': info['signature'],
+        'docstring': info['docstring'],
+        'parent_class': info['parent_class'],
+        'decorators': info['decorators']
+    } for info, kind in definitions]
+    return {'symbols': symbols, 'imports': analysis['imports']}
+
+class SymbolIndex:
+    """Symbol table of a repository's Python files, built at ingest time.
+
+    Lookups by name or qualified name are dict hits; prefix lookups bisect a sorted
+    name list that is rebuilt lazily after updates.
+    """
+
+    def __init__(self):
+        self.files: Dict[str, Dict[str, Any]] = {}
+        self._by_name: Dict[str, List[Dict[str, Any]]] = {}
+        self._sorted_names: List[str] = []
+        self._dirty = False
+
+    def __len__(self) -> int:
+        return sum(len(entry['symbols']) for entry in list(self.files.values()))
+
+    def __contains__(self, file_path: str) -> bool:
+        return self._key(file_path) in self.files
+
+    @staticmethod
+    def _key(file_path: str) -> str:
+        return str(Path(file_path).resolve())
+
+    def set_file(self, file_path: str, entry: Dict[str, Any]):
+        """Replace the symbols and imports recorded for a file"""
+        self.files[self._key(file_path)] = entry
+        self._dirty = True
+
+    def remove_file(self, file_path: str):
+        if self.files.pop(self._key(file_path), None) is not None:
+            self._dirty = True
+
+    def _build_lookup(self):
+        if not self._dirty:
+            return
+        # A file watcher may refresh the index while this runs: iterate over a copy, and clear
+        # the flag first so updates made meanwhile trigger another rebuild
+        self._dirty = False
+        by_name = {}
+        for entry in list(self.files.values()):
+            for symbol in entry['symbols']:
+                by_name.setdefault(symbol['name'], []).append(symbol)
+                if symbol['qualified_name'] != symbol['name']:
+                    by_name.setdefault(symbol['qualified_name'], []).append(symbol)
+        self._by_name = by_name
+        self._sorted_names = sorted(by_name)
+
+    def find(self, name: str, kind: str = None) -> List[Dict[str, Any]]:
+        """Symbols whose name or qualified name is exactly `name`"""
+        self._build_lookup()
+        return [symbol for symbol in self._by_name.get(name, []) if kind is None or symbol['kind'] == kind]
+
+    def find_prefix(self, prefix: str, kind: str = None, limit: int = 50) -> List[Dict[str, Any]]:
+        """Symbols whose name or qualified name starts with `prefix`"""
+        self._build_lookup()
+        results = []
+        start = bisect.bisect_left(self._sorted_names, prefix)
+        for name in self._sorted_names[start:]:
+            if not name.startswith(prefix) or len(results) >= limit:
+                break
+            for symbol in self._by_name.get(name, ()):
+                if (kind is None or symbol['kind'] == kind) and symbol not in results:
+                    results.append(symbol)
+        return results[:limit]
+
+    def file_symbols(self, file_path: str, kind: str = None) -> Optional[List[Dict[str, Any]]]:
+        """Symbols of one file in source order, or None if the file was not indexed"""
+        entry = self.files.get(self._key(file_path))
+        if entry is None:
+            return None
+        return [symbol for symbol in entry['symbols'] if kind is None or symbol['kind'] == kind]
+
+    def file_imports(self, file_path: str) -> Optional[List[str]]:
+        entry = self.files.get(self._key(file_path))
+        return None if entry is None else entry['imports']
+
+    def save(self, path: str):
+        os.makedirs(path, exist_ok=True)
+        symbols_path = os.path.join(path, SYMBOLS_FILENAME)
+        with open(symbols_path + ".tmp", "w", encoding="utf-8") as f:
+            json.dump({'version': 1, 'files': self.files}, f)
+        os.replace(symbols_path + ".tmp", symbols_path)
+
+    @classmethod
+    def load(cls, path: str):
+        """Load a saved symbol table, or None if there is none"""
+        symbols_path = os.path.join(path, SYMBOLS_FILENAME)
+        if not os.path.exists(symbols_path):
+            return None
+
+        with open(symbols_path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+
+        index = cls()
+        index.files = data['files']
+        index._dirty = True
+        return index
@@ -6,7 +6,20 @@ This script tests the core components without requiring the web interface.
 
 import os
 import sys
+import tempfile
+from langchain.schema import Document
+from chatbortai import embeddings
 from chatbortai.agent import CodePalManager
+from chatbortai.chunking import locate_chunks
+from chatbortai.config import Config
+from chatbortai.directory_tree import DirectoryTree
+from chatbortai.document_store import ColumnarDocumentStore
+from chatbortai.embeddings import EmbeddingModelRegistry, FallbackEmbeddingModel
+from chatbortai.lexical_index import BM25Index, tokenize_code
+from chatbortai.query_cache import QueryCache, query_cache
+from chatbortai.repository import RepositoryIdentity
+from chatbortai.tools import DirectoryListerTool
+from chatbortai.vector_store import CodeVectorStore
 
 def test_codepal():
     """Test CodePal functionality with the sample repository"""
@@ -59,18 +72,280 @@ def test_codepal():
     print("\n✅ CodePal test completed!")
     return True
 
+def test_incremental_index():
+    """Re-initializing a changed repository only re-indexes changed files, and the saved store reloads"""
+    
+    print("\n🔁 Testing incremental re-indexing")
+    print("=" * 50)
+    
+    with tempfile.TemporaryDirectory() as repo_path, tempfile.TemporaryDirectory() as store_path:
+        # Keep the test's stores out of the working directory, and answer without an LLM
+        saved_settings = (Config.VECTOR_STORE_PATH, Config.LLM_PROVIDER)
+        Config.VECTOR_STORE_PATH, Config.LLM_PROVIDER = store_path, "demo"
+        try:
+            def write(name, content):
+                with open(os.path.join(repo_path, name), "w", encoding="utf-8") as f:
+                    f.write(content)
+            
+            write("alpha.py", "def alpha_handler():\n    return 1\n")
+            write("beta.py", "class BetaModel:\n    pass\n")
+            write("delta.py", "def delta_helper():\n    return 4\n")
+            
+            print("1. Indexing a temporary repository...")
+            manager = CodePalManager()
+            result = manager.initialize_repository(repo_path)
+            print(f"   Result: {result}")
+            assert "0 unchanged, 0 updated, 3 added, 0 removed files" in result, "Expected all 3 files to be added"
+            
+            print("2. Editing, deleting and adding files, then re-initializing...")
+            write("alpha.py", "def alpha_handler(request):\n    return request.user\n")
+            os.remove(os.path.join(repo_path, "delta.py"))
+            write("gamma.py", "def gamma_handler(event):\n    return event\n")
+            result = manager.initialize_repository(repo_path)
+            print(f"   Result: {result}")
+            assert "1 unchanged, 1 updated, 1 added, 1 removed files" in result, \
+                "Expected 1 unchanged, 1 updated, 1 added and 1 removed file"
+            
+            print("3. Reloading the saved store from disk...")
+            saved_path = RepositoryIdentity(repo_path).vector_store_path
+            for filename in ["manifest.json", "chunk_store.json", "chunk_texts.bin", "chunk_columns.npy",
+                             "lexical_index.json", "lexical_postings.npy", "symbols.json", "statistics.json",
+                             "directory_tree.json"]:
+                assert os.path.exists(os.path.join(saved_path, filename)), f"Saved store is missing {filename}"
+            reloaded = CodeVectorStore()
+            reloaded.load(saved_path)
+            assert sorted(reloaded.manifest.files) == ["alpha.py", "beta.py", "gamma.py"], \
+                f"Unexpected manifest entries: {sorted(reloaded.manifest.files)}"
+            assert reloaded.document_count == manager.vector_store.document_count, \
+                f"Reloaded {reloaded.document_count} documents, expected {manager.vector_store.document_count}"
+            assert reloaded.symbol_index.find("gamma_handler") and not reloaded.symbol_index.find("delta_helper"), \
+                "Symbol table does not match the repository"
+            assert reloaded.statistics.summary['files'] == 3, \
+                f"Statistics count {reloaded.statistics.summary['files']} files, expected 3"
+            assert [doc.metadata['file_name'] for doc, _ in reloaded.lexical_search("gamma_handler", 1)] == ["gamma.py"], \
+                "Keyword index does not match the repository"
+            
+            print("4. Searching in demo mode...")
+            response = manager.ask_question("search for gamma_handler")
+            print(f"   Response: {response[:200]}...")
+            assert "Error" not in response and "gamma_handler" in response, "Demo search did not find gamma_handler"
+        finally:
+            Config.VECTOR_STORE_PATH, Config.LLM_PROVIDER = saved_settings
+    
+    print("\n✅ Incremental re-indexing test completed!")
+
+def test_columnar_store():
+    """Chunks, metadata and tombstones survive a save and reload, and ids stay stable"""
+    
+    print("\n🗄️ Testing the columnar document store")
+    print("=" * 50)
+    
+    with tempfile.TemporaryDirectory() as store_path:
+        store = ColumnarDocumentStore()
+        for i in range(4):
+            store.append(Document(page_content=f"def f{i}():\n    return 'é{i}'\n",
+                                  metadata={'file_path': f"/repo/m{i % 2}.py", 'chunk_index': i,
+                                            'total_chunks': 4, 'start_line': i * 2 + 1, 'end_line': i * 2 + 2}))
+        store.delete(1)
+        store.save(store_path)
+        
+        reloaded = ColumnarDocumentStore.load(store_path)
+        assert len(reloaded) == 4 and reloaded.live_count == 3, "Tombstoned chunk should keep its id"
+        assert reloaded[1] is None and not reloaded.is_live(1), "Tombstone lost on reload"
+        doc = reloaded[2]
+        assert doc.page_content == "def f2():\n    return 'é2'\n", f"Unexpected text: {doc.page_content!r}"
+        assert doc.metadata['file_path'] == "/repo/m0.py" and doc.metadata['start_line'] == 5, doc.metadata
+        assert 'start_byte' not in doc.metadata, "Unknown byte offsets should be left out of the metadata"
+        
+        # Chunks added and removed after a reload are merged into the next save
+        new_id = reloaded.append(Document(page_content="x = 1\n", metadata={'file_path': "/repo/m2.py"}))
+        reloaded.delete(0)
+        reloaded.save(store_path)
+        again = ColumnarDocumentStore.load(store_path)
+        assert new_id == 4 and again[4].page_content == "x = 1\n", "Appended chunk lost"
+        assert [again.is_live(i) for i in range(5)] == [False, False, True, True, True], "Tombstones not preserved"
+        assert again.live_count == 3, f"Expected 3 live chunks, found {again.live_count}"
+    
+    print("✅ Columnar document store test completed!")
+
+def test_lexical_index():
+    """Code tokenization and BM25 ranking, before and after a save"""
+    
+    print("\n🔤 Testing the BM25 keyword index")
+    print("=" * 50)
+    
+    tokens = tokenize_code("def getUserId(HTTPServer, max_retries): return x2")
+    for token in ["getuserid", "get", "user", "id", "httpserver", "http", "server", "max_retries", "max", "retries"]:
+        assert token in tokens, f"Missing token {token!r} in {tokens}"
+    
+    index = BM25Index()
+    index.add(0, "def calculate_user_permissions(user):\n    return user.roles")
+    index.add(1, "def process_payment(card):\n    refund(card)")
+    index.add(2, "class UserProfile:\n    permissions = []")
+    hits = index.search("calculate_user_permissions")
+    assert [doc_id for doc_id, _ in hits] == [0, 2], f"Unexpected ranking: {hits}"
+    assert hits[0][1] > hits[1][1] > 0, f"Scores should decrease: {hits}"
+    assert index.search("nonexistent_identifier") == [], "Unknown terms should match nothing"
+    
+    index.remove(0)
+    assert [doc_id for doc_id, _ in index.search("permissions")] == [2], "Removed chunk still returned"
+    
+    with tempfile.TemporaryDirectory() as store_path:
+        before = index.search("user payment refund")
+        index.save(store_path)
+        reloaded = BM25Index.load(store_path)
+        assert len(reloaded) == 2, f"Expected 2 indexed chunks, found {len(reloaded)}"
+        assert reloaded.search("user payment refund") == before, "Ranking changed after reload"
+        
+        # Updates after a reload are searched together with the saved postings
+        reloaded.add(3, "def refund_payment(payment):\n    refund(payment)")
+        reloaded.remove(1)
+        assert [doc_id for doc_id, _ in reloaded.search("refund")] == [3], "Update after reload not applied"
+        reloaded.save(store_path)
+        assert [doc_id for doc_id, _ in BM25Index.load(store_path).search("refund")] == [3], "Merged save lost updates"
+    
+    print("✅ BM25 keyword index test completed!")
+
+def test_chunk_locations():
+    """Line and UTF-8 byte ranges of (overlapping) chunks"""
+    
+    print("\n📍 Testing chunk line and byte ranges")
+    print("=" * 50)
+    
+    content = "# héllo\ndef a():\n    return 'ü'\n\ndef b():\n    return 2\n"
+    chunks = ["# héllo\ndef a():", "def a():\n    return 'ü'", "def b():\n    return 2", "missing"]
+    positions = locate_chunks(content, chunks)
+    assert [(start, end) for start, end, _, _ in positions] == [(1, 2), (2, 3), (5, 6), (-1, -1)], positions
+    data = content.encode('utf-8')
+    for chunk, (_, _, start_byte, end_byte) in zip(chunks[:3], positions):
+        assert data[start_byte:end_byte] == chunk.encode('utf-8'), f"Byte range {start_byte}-{end_byte} does not hold {chunk!r}"
+    assert positions[3][2:] == (-1, -1), "A chunk that is not found should have no byte range"
+    
+    print("✅ Chunk location test completed!")
+
+def test_directory_lister():
+    """Depth, patterns, paging and freshness of directory listings"""
+    
+    print("\n📁 Testing the directory lister")
+    print("=" * 50)
+    
+    with tempfile.TemporaryDirectory() as repo_path:
+        os.makedirs(os.path.join(repo_path, "pkg", "sub"))
+        os.makedirs(os.path.join(repo_path, "node_modules", "lib"))
+        for name, content in [("main.py", "print(1)\n"), (".env", "KEY=1\n"), ("pkg/util.py", "x = 1\n"),
+                              ("pkg/sub/deep.py", "y = 2\n"), ("node_modules/lib/index.js", "z\n")]:
+            with open(os.path.join(repo_path, name), "w", encoding="utf-8") as f:
+                f.write(content)
+        
+        tree = DirectoryTree()
+        tree.refresh(repo_path)
+        assert sorted(path for path, _ in tree.files()) == ["main.py", "pkg/sub/deep.py", "pkg/util.py"], \
+            "Ingestion should skip hidden files and ignored directories"
+        
+        lister = DirectoryListerTool(tree, page_size=3)
+        listing = lister.list_directory(repo_path)
+        assert [entry.name for entry in listing.directories] == ["node_modules", "pkg"], listing.directories
+        assert [entry.name for entry in listing.files] == [".env", "main.py"], listing.files
+        pkg = listing.directories[1]
+        assert (pkg.file_count, pkg.size) == (2, 12), f"Unexpected totals for pkg: {pkg}"
+        
+        listing = lister.list_directory(repo_path, depth=3, pattern="*.py")
+        assert [entry.name for entry in listing.files] == ["main.py", "pkg/sub/deep.py", "pkg/util.py"], listing.files
+        
+        # Three subdirectories down to depth 2, then three files
+        first_page = lister._run(repo_path, depth=2)
+        assert "pkg/sub/" in first_page and "main.py" not in first_page, first_page
+        assert "entries 1-3 of 6; continue with offset=3" in first_page, first_page
+        second_page = lister._run(repo_path, depth=2, offset=3)
+        assert "pkg/sub/" not in second_page and "pkg/util.py" in second_page, second_page
+        assert "entries 4-6 of 6]" in second_page, second_page
+        
+        # A directory changed since the snapshot is listed from disk
+        with open(os.path.join(repo_path, "pkg", "added.py"), "w", encoding="utf-8") as f:
+            f.write("z = 3\n")
+        os.utime(os.path.join(repo_path, "pkg"), ns=(0, 0))
+        listing = lister.list_directory(os.path.join(repo_path, "pkg"))
+        assert "added.py" in [entry.name for entry in listing.files], "Stale snapshot served"
+    
+    print("✅ Directory lister test completed!")
+
+def test_caches():
+    """Shared embedding model registry, query embedding cache and batched cached search"""
+    
+    print("\n🧠 Testing model, query and result caches")
+    print("=" * 50)
+    
+    # Models: loaded once per name; a fallback is retried instead of being kept for good
+    loads = []
+    def load(model_name):
+        loads.append(model_name)
+        if len(loads) == 1:
+            return FallbackEmbeddingModel(), "fallback"
+        return FallbackEmbeddingModel(), model_name
+    saved_settings = (embeddings.load_embedding_model, Config.EMBEDDING_RETRY_SECONDS)
+    embeddings.load_embedding_model, Config.EMBEDDING_RETRY_SECONDS = load, 0
+    try:
+        registry = EmbeddingModelRegistry()
+        fallback = registry.get("some-model")
+        model = registry.get("some-model")
+        assert model is not fallback and len(loads) == 2, "A fallback model should be replaced on the next attempt"
+        assert registry.get("some-model") is model and len(loads) == 2, "A loaded model should be reused"
+        assert registry.metrics()["some-model"]['hits'] == 1, registry.metrics()
+        assert registry.signature(model) != registry.signature(fallback), "Signatures should name the loaded model"
+    finally:
+        embeddings.load_embedding_model, Config.EMBEDDING_RETRY_SECONDS = saved_settings
+    
+    # Query embeddings: normalized keys, bounded LRU
+    cache = QueryCache(max_size=2, path="")
+    cache.put_embedding("model:384", "Find  the Parser", [1.0])
+    assert cache.get_embedding("model:384", "find the parser") == [1.0], "Normalized query should hit"
+    assert cache.get_embedding("other:384", "find the parser") is None, "Entries are per model signature"
+    cache.put_embedding("model:384", "second", [2.0])
+    cache.put_embedding("model:384", "third", [3.0])
+    assert cache.get_embedding("model:384", "second") == [2.0] and len(cache.embeddings) == 2, "LRU bound not kept"
+    
+    # Batched search matches single searches, and results are cached per index version
+    with tempfile.TemporaryDirectory() as repo_path:
+        for name, content in [("parser.py", "def parse_tokens(text):\n    return text.split()\n"),
+                              ("payment.py", "def charge_card(card, amount):\n    return card.charge(amount)\n")]:
+            with open(os.path.join(repo_path, name), "w", encoding="utf-8") as f:
+                f.write(content)
+        store = CodeVectorStore()
+        store.refresh(repo_path)
+        queries = ["parse tokens", "charge a card"]
+        batched = store.batch_similarity_search(queries, k=2)
+        for query, hits in zip(queries, batched):
+            single = store.similarity_search_with_score(query, k=2)
+            assert [doc.page_content for doc, _ in hits] == [doc.page_content for doc, _ in single], query
+        
+        hits_before = query_cache.results.hits
+        store.similarity_search("parse tokens", k=2)
+        assert query_cache.results.hits == hits_before + 1, "Repeated search should be answered from the cache"
+        
+        version = store.index_version
+        with open(os.path.join(repo_path, "extra.py"), "w", encoding="utf-8") as f:
+            f.write("def extra():\n    pass\n")
+        store.refresh(repo_path)
+        assert store.index_version != version, "Refreshing the index should invalidate cached results"
+    
+    print("✅ Cache test completed!")
+
 def main():
     """Main function"""
     try:
-        success = test_codepal()
-        if success:
-            print("\n🎉 All tests passed! CodePal is working correctly.")
-            print("\nTo run the web interface:")
-            print("1. Set your OpenAI API key in environment variables")
-            print("2. Run: streamlit run app.py")
-        else:
+        for test in [test_columnar_store, test_lexical_index, test_chunk_locations, test_directory_lister,
+                     test_caches, test_incremental_index]:
+            test()
+        if not test_codepal():
             print("\n❌ Some tests failed. Please check the errors above.")
             sys.exit(1)
+        print("\n🎉 All tests passed! CodePal is working correctly.")
+        print("\nTo run the web interface:")
+        print("1. Set your OpenAI API key in environment variables")
+        print("2. Run: streamlit run app.py")
+    except AssertionError as e:
+        print(f"\n❌ Test failed: {e}")
+        sys.exit(1)
     except Exception as e:
         print(f"\n❌ Test failed with error: {e}")
         sys.exit(1)
@@ -1,42 +1,156 @@
 import os
-import ast
-from pathlib import Path
-from typing import List, Dict, Any, Optional
+import asyncio
+import threading
+from dataclasses import dataclass, field
+from typing import List, Dict, Optional, Tuple
 from langchain.tools import BaseTool
-from langchain.schema import Document
-import faiss
-import numpy as np
-from sentence_transformers import SentenceTransformer
 from chatbortai.config import Config
+from chatbortai.code_analysis import analyze_file
+from chatbortai.chunking import approximate_token_count
+from chatbortai.directory_tree import DirectoryTree
+
+@dataclass
+class DirectoryEntry:
+    """One item of a directory listing; names are relative to the listed directory"""
+    name: str
+    is_dir: bool
+    supported: bool = False  # Files only: extension is in Config.SUPPORTED_EXTENSIONS
+    size: Optional[int] = None  # Files: bytes; directories: bytes of all files below
+    file_count: Optional[int] = None  # Directories only: files below, recursively
+    
+    @property
+    def extension(self) -> str:
+        return "" if self.is_dir else os.path.splitext(self.name)[1]
+
+@dataclass
+class DirectoryListing:
+    """Subdirectories and files of a directory (down to `depth` levels), each sorted by path"""
+    path: str
+    directories: List[DirectoryEntry] = field(default_factory=list)
+    files: List[DirectoryEntry] = field(default_factory=list)
+    depth: int = 1
+    pattern: Optional[str] = None
+    
+    def python_files(self) -> List[str]:
+        return [entry.name for entry in self.files if entry.extension == '.py']
+    
+    def render(self, offset: int = 0, limit: int = None) -> str:
+        """Describe the listing, or the page of `limit` entries (directories first) from `offset`"""
+        result = f"Directory: {self.path}"
+        if self.depth > 1:
+            result += f" (depth {self.depth})"
+        if self.pattern:
+            result += f" (matching '{self.pattern}')"
+        result += "\n\n"
+        if not self.directories and not self.files:
+            return result + ("No entries match." if self.pattern else "Directory is empty.")
+        
+        total = len(self.directories) + len(self.files)
+        end = total if limit is None else min(total, offset + limit)
+        directories = self.directories[offset:end]
+        files = self.files[max(0, offset - len(self.directories)):max(0, end - len(self.directories))]
+        
+        if directories:
+            result += f"Subdirectories ({len(self.directories)}):\n"
+            for entry in directories:
+                result += f"  📁 {entry.name}/"
+                if entry.file_count is not None:
+                    result += f" ({entry.file_count} files, {entry.size} bytes)"
+                result += "\n"
+            result += "\n"
+        
+        if files:
+            result += f"Files ({len(self.files)}):\n"
+            for entry in files:
+                details = [] if entry.size is None else [f"{entry.size} bytes"]
+                # Add file extension indicator
+                if not entry.supported:
+                    details.append("unsupported type")
+                result += f"  📄 {entry.name}" + (f" ({', '.join(details)})" if details else "") + "\n"
+        
+        if offset > 0 or end < total:
+            result += f"\n... [entries {offset + 1}-{end} of {total}"
+            result += f"; continue with offset={end}]" if end < total else "]"
+        
+        return result
+
+@dataclass
+class SymbolRecord:
+    """A class or function (including methods) found in a file"""
+    qualified_name: str
+    kind: str  # "class", "function" or "method"
+    start_line: int
+    end_line: int
+    signature: str = ""
+
+@dataclass
+class FileStructure:
+    """Imports, classes and functions of one Python file"""
+    file_path: str
+    imports: List[str] = field(default_factory=list)
+    classes: List[SymbolRecord] = field(default_factory=list)
+    functions: List[SymbolRecord] = field(default_factory=list)
+    
+    def render(self) -> str:
+        """Describe a file's imports, classes and functions (qualified names and line numbers)"""
+        result = f"File: {self.file_path}\n\n"
+        
+        if self.imports:
+            result += f"Imports ({len(self.imports)}):\n"
+            for imp in self.imports:
+                result += f"  - {imp}\n"
+            result += "\n"
+        
+        if self.classes:
+            result += f"Classes ({len(self.classes)}):\n"
+            for record in self.classes:
+                result += f"  - {record.qualified_name} (line {record.start_line})\n"
+            result += "\n"
+        
+        if self.functions:
+            result += f"Functions ({len(self.functions)}):\n"
+            for record in self.functions:
+                result += f"  - {record.qualified_name} (line {record.start_line})\n"
+        
+        if not any([self.imports, self.classes, self.functions]):
+            result += "No functions, classes, or imports found in this file."
+        
+        return result
+
+def _current_symbol_index(vector_store, file_path: str):
+    """The store's symbol table if it covers the file as it is on disk now, else None (parse the file instead)"""
+    symbol_index = getattr(vector_store, 'symbol_index', None)
+    if symbol_index is None or file_path not in symbol_index or not vector_store.is_file_current(file_path):
+        return None
+    return symbol_index
 
 class FileSearchTool(BaseTool):
     """Tool for semantic search across the codebase"""
     
     name: str = "file_search_tool"
-    description: str = "Search for files or code snippets related to a query using semantic search"
+    description: str = "Search for files or code snippets related to a query or identifier using keyword and semantic search"
     
-    def __init__(self, vector_store, embedding_model):
+    def __init__(self, vector_store):
         super().__init__()
         # Store as private attributes to avoid Pydantic field validation
         self._vector_store = vector_store
-        self._embedding_model = embedding_model
     
     def _run(self, query: str) -> str:
-        """Perform semantic search and return relevant results"""
+        """Perform hybrid (BM25 + semantic) search and return relevant results"""
         try:
-            # Encode the query
-            query_embedding = self._embedding_model.encode([query])
-            
             # Search in vector store
-            if self._vector_store is not None and hasattr(self._vector_store, 'faiss_index'):
-                D, I = self._vector_store.faiss_index.search(query_embedding.astype('float32'), k=5)
+            if self._vector_store is not None and getattr(self._vector_store, 'faiss_index', None) is not None:
+                hits = self._vector_store.hybrid_search(
+                    query, k=5, score_threshold=Config.SEARCH_SCORE_THRESHOLD
+                )
                 
                 results = []
-                for idx in I[0]:
-                    if idx < len(self._vector_store.documents):
-                        doc = self._vector_store.documents[idx]
-                        results.append(f"File: {doc.metadata.get('file_path', 'Unknown')}\n"
-                                     f"Content: {doc.page_content[:200]}...\n")
+                for doc, score in hits:
+                    location = doc.metadata.get('file_path', 'Unknown')
+                    if 'start_line' in doc.metadata:
+                        location += f" (lines {doc.metadata['start_line']}-{doc.metadata['end_line']})"
+                    results.append(f"File: {location} (score: {score:.3f})\n"
+                                 f"Content: {doc.page_content[:200]}...\n")
                 
                 if results:
                     return "\n".join(results)
@@ -47,31 +161,152 @@ class FileSearchTool(BaseTool):
                 
         except Exception as e:
             return f"Error during file search: {str(e)}"
+    
+    async def _arun(self, query: str) -> str:
+        """Search in a worker thread so concurrent tool calls overlap (FAISS releases the GIL)"""
+        return await asyncio.to_thread(self._run, query)
 
 class FileReaderTool(BaseTool):
     """Tool for reading file contents"""
     
     name: str = "file_reader_tool"
-    description: str = "Read and return the contents of a specific file"
+    description: str = ("Read a file page by page. Returns lines from start_line (default 1) up to end_line, "
+                        "limit lines, or the token budget, with a marker telling where to continue. "
+                        "Use outline=True first on large Python files to see their functions and classes with line numbers")
     
-    def _run(self, file_path: str) -> str:
-        """Read file contents and return them"""
+    def __init__(self, vector_store=None, token_budget: int = None):
+        super().__init__()
+        # Chunk byte offsets from the vector store let pages start with a seek
+        self._vector_store = vector_store
+        self._token_budget = token_budget or Config.FILE_READER_TOKEN_BUDGET
+        self._usage = {'calls': 0, 'bytes_returned': 0, 'tokens_returned': 0, 'truncated_calls': 0}
+        self._usage_lock = threading.Lock()
+    
+    @property
+    def usage(self) -> Dict[str, int]:
+        """Cumulative size accounting over all calls of this tool"""
+        with self._usage_lock:
+            return dict(self._usage)
+    
+    def _run(self, file_path: str, start_line: Optional[int] = None, end_line: Optional[int] = None,
+             limit: Optional[int] = None, outline: bool = False) -> str:
+        """Read a page of a file (or its outline) within the token budget"""
         try:
             if not os.path.exists(file_path):
                 return f"File not found: {file_path}"
             
-            # Check file size
-            file_size = os.path.getsize(file_path)
-            if file_size > Config.MAX_FILE_SIZE:
-                return f"File too large to read ({file_size} bytes). Maximum allowed: {Config.MAX_FILE_SIZE} bytes"
-            
-            with open(file_path, 'r', encoding='utf-8') as f:
-                content = f.read()
+            if outline:
+                return self._account(*self._outline(file_path))
             
-            return f"File: {file_path}\n\nContent:\n{content}"
+            start_line = start_line or 1
+            if limit is not None:
+                end_line = min(end_line or start_line + limit - 1, start_line + limit - 1)
+            return self._read_lines(file_path, start_line, end_line)
             
         except Exception as e:
             return f"Error reading file {file_path}: {str(e)}"
+    
+    async def _arun(self, file_path: str, start_line: Optional[int] = None, end_line: Optional[int] = None,
+                    limit: Optional[int] = None, outline: bool = False) -> str:
+        """Read in a worker thread so file I/O does not block the event loop"""
+        return await asyncio.to_thread(self._run, file_path, start_line, end_line, limit, outline)
+    
+    def _read_lines(self, file_path: str, start_line: int, end_line: Optional[int]) -> str:
+        """Read lines from start_line (1-based) to end_line or the token budget, whichever comes first"""
+        if start_line < 1 or (end_line is not None and end_line < start_line):
+            return f"Invalid line range {start_line}-{end_line} for {file_path}"
+        
+        line_no, offset = (1, 0)
+        if self._vector_store is not None and start_line > 1:
+            line_no, offset = self._vector_store.line_offset(file_path, start_line)
+        
+        lines = []
+        tokens = 0
+        truncated = False
+        with open(file_path, 'rb') as f:
+            if offset > 0:
+                f.seek(offset - 1)
+                if f.read(1) != b'\n':
+                    # The chunk began mid-line; resume at the next full line
+                    f.readline()
+                    line_no += 1
+            if line_no > start_line:
+                f.seek(0)
+                line_no = 1
+            
+            for raw_line in f:
+                if end_line is not None and line_no > end_line:
+                    break
+                if line_no >= start_line:
+                    line = raw_line.decode('utf-8', errors='replace').rstrip('\r\n')
+                    line_tokens = approximate_token_count(line)
+                    if tokens + line_tokens > self._token_budget:
+                        truncated = True
+                        if not lines:
+                            # A single line over budget (minified code, data) is cut
+                            lines.append(line[:len(line) * self._token_budget // line_tokens] + " ...[line truncated]")
+                        break
+                    lines.append(line)
+                    tokens += line_tokens
+                line_no += 1
+        
+        if not lines:
+            return f"No lines from {start_line} in {file_path}"
+        
+        last_line = start_line + len(lines) - 1
+        result = f"File: {file_path} (lines {start_line}-{last_line})\n\nContent:\n" + "\n".join(lines)
+        if truncated:
+            result += (f"\n\n... [truncated at the {self._token_budget}-token budget; "
+                       f"continue with start_line={last_line + 1}]")
+        return self._account(result, truncated, os.path.getsize(file_path))
+    
+    def _outline(self, file_path: str) -> Tuple[str, bool]:
+        """Symbol skeleton of a Python file (signatures, line spans, first docstring lines) and whether it was truncated"""
+        if not file_path.endswith('.py'):
+            return f"Outline is only available for Python files; read {file_path} with start_line/limit instead", False
+        
+        symbol_index = _current_symbol_index(self._vector_store, file_path)
+        if symbol_index is not None:
+            symbols = [(s['qualified_name'], s['signature'], s['start_line'], s['end_line'], s['docstring'])
+                       for s in symbol_index.file_symbols(file_path)]
+        else:
+            analysis = analyze_file(file_path)
+            symbols = [(d['qualified_name'], d['signature'], d['lineno'], d['end_lineno'], d['docstring'])
+                       for d in analysis['classes'] + analysis['functions']]
+            symbols.sort(key=lambda symbol: symbol[2])
+        
+        result = f"Outline of {file_path}:\n\n"
+        tokens = 0
+        for i, (qualified_name, signature, start, end, docstring) in enumerate(symbols):
+            indent = "    " * qualified_name.count('.')
+            entry = f"{indent}{signature}  # lines {start}-{end}\n"
+            if docstring:
+                entry += f"{indent}    \"\"\"{docstring.strip().splitlines()[0]}\"\"\"\n"
+            
+            tokens += approximate_token_count(entry)
+            if tokens > self._token_budget:
+                result += (f"\n... [truncated at the {self._token_budget}-token budget; {len(symbols) - i} more "
+                           f"definitions from line {start}, read them with start_line={start}]")
+                return result, True
+            result += entry
+        if not symbols:
+            result += "No functions or classes found in this file."
+        return result, False
+    
+    def _account(self, result: str, truncated: bool, file_size: int = None) -> str:
+        """Record the size of a response and append it as a footer"""
+        returned_bytes = len(result.encode('utf-8'))
+        returned_tokens = approximate_token_count(result)
+        with self._usage_lock:
+            self._usage['calls'] += 1
+            self._usage['bytes_returned'] += returned_bytes
+            self._usage['tokens_returned'] += returned_tokens
+            self._usage['truncated_calls'] += int(truncated)
+        
+        footer = f"[{returned_bytes} bytes, ~{returned_tokens} tokens"
+        if file_size is not None:
+            footer += f" of a {file_size}-byte file"
+        return f"{result}\n{footer}]"
 
 class ASTParserTool(BaseTool):
     """Tool for analyzing Python code structure using AST"""
@@ -79,125 +314,115 @@ class ASTParserTool(BaseTool):
     name: str = "ast_parser_tool"
     description: str = "Analyze Python file structure and extract functions, classes, and imports"
     
+    def __init__(self, vector_store=None):
+        super().__init__()
+        # Its symbol table, built at ingest time, spares re-parsing files unchanged since then
+        self._vector_store = vector_store
+    
     def _run(self, file_path: str) -> str:
         """Parse Python file and extract structural information"""
         try:
             if not file_path.endswith('.py'):
                 return "This tool only works with Python (.py) files"
-            
-            if not os.path.exists(file_path):
-                return f"File not found: {file_path}"
-            
-            with open(file_path, 'r', encoding='utf-8') as f:
-                content = f.read()
-            
-            # Parse AST
-            tree = ast.parse(content)
-            
-            # Extract information
-            functions = []
-            classes = []
-            imports = []
-            
-            for node in ast.walk(tree):
-                if isinstance(node, ast.FunctionDef):
-                    functions.append(node.name)
-                elif isinstance(node, ast.ClassDef):
-                    classes.append(node.name)
-                elif isinstance(node, (ast.Import, ast.ImportFrom)):
-                    if isinstance(node, ast.Import):
-                        for alias in node.names:
-                            imports.append(alias.name)
-                    else:
-                        module = node.module or ""
-                        for alias in node.names:
-                            imports.append(f"{module}.{alias.name}")
-            
-            result = f"File: {file_path}\n\n"
-            
-            if imports:
-                result += f"Imports ({len(imports)}):\n"
-                for imp in imports:
-                    result += f"  - {imp}\n"
-                result += "\n"
-            
-            if classes:
-                result += f"Classes ({len(classes)}):\n"
-                for cls in classes:
-                    result += f"  - {cls}\n"
-                result += "\n"
-            
-            if functions:
-                result += f"Functions ({len(functions)}):\n"
-                for func in functions:
-                    result += f"  - {func}\n"
-            
-            if not any([imports, classes, functions]):
-                result += "No functions, classes, or imports found in this file."
-            
-            return result
-            
+            return self.structure(file_path).render()
+        except FileNotFoundError as e:
+            return str(e)
         except SyntaxError as e:
             return f"Syntax error in {file_path}: {str(e)}"
         except Exception as e:
             return f"Error parsing {file_path}: {str(e)}"
+    
+    async def _arun(self, file_path: str) -> str:
+        """Parse in a worker thread so the event loop stays free"""
+        return await asyncio.to_thread(self._run, file_path)
+    
+    def structure(self, file_path: str) -> FileStructure:
+        """Structure of a Python file, from the symbol table when it covers the file as it is now"""
+        if not file_path.endswith('.py'):
+            raise ValueError("This tool only works with Python (.py) files")
+        
+        symbol_index = _current_symbol_index(self._vector_store, file_path)
+        if symbol_index is not None:
+            records = [SymbolRecord(s['qualified_name'], s['kind'], s['start_line'], s['end_line'], s['signature'])
+                       for s in symbol_index.file_symbols(file_path)]
+            return FileStructure(
+                file_path,
+                list(symbol_index.file_imports(file_path)),
+                [record for record in records if record.kind == 'class'],
+                [record for record in records if record.kind != 'class']
+            )
+        
+        if not os.path.exists(file_path):
+            raise FileNotFoundError(f"File not found: {file_path}")
+        
+        # Single cached parse (functions include async defs and methods)
+        analysis = analyze_file(file_path)
+        return FileStructure(
+            file_path,
+            list(analysis['imports']),
+            [SymbolRecord(c['qualified_name'], 'class', c['lineno'], c['end_lineno'], c['signature'])
+             for c in analysis['classes']],
+            [SymbolRecord(f['qualified_name'], 'method' if f['parent_class'] else 'function',
+                          f['lineno'], f['end_lineno'], f['signature'])
+             for f in analysis['functions']]
+        )
 
 class DirectoryListerTool(BaseTool):
     """Tool for listing directory contents"""
     
     name: str = "directory_lister_tool"
-    description: str = "List all files and subdirectories within a given directory"
+    description: str = ("List files (with sizes) and subdirectories (with file counts) of a directory. "
+                        "depth > 1 lists nested levels in one call, pattern filters by glob (e.g. '*.py'), "
+                        "and long listings are paged: continue with the offset given at the end")
+    
+    def __init__(self, directory_tree: DirectoryTree = None, page_size: int = None):
+        super().__init__()
+        # Snapshot of the indexed repository; other directories are scanned on demand
+        self._directory_tree = directory_tree
+        self._page_size = page_size or Config.DIRECTORY_PAGE_SIZE
     
-    def _run(self, directory_path: str) -> str:
+    def _run(self, directory_path: str, depth: int = 1, pattern: Optional[str] = None,
+             offset: int = 0, limit: Optional[int] = None) -> str:
         """List directory contents"""
         try:
+            listing = self.list_directory(directory_path, depth, pattern)
+            return listing.render(max(0, offset), min(limit or self._page_size, self._page_size))
+        except (FileNotFoundError, NotADirectoryError) as e:
+            return str(e)
+        except Exception as e:
+            return f"Error listing directory {directory_path}: {str(e)}"
+    
+    async def _arun(self, directory_path: str, depth: int = 1, pattern: Optional[str] = None,
+                    offset: int = 0, limit: Optional[int] = None) -> str:
+        """List in a worker thread so directory I/O does not block the event loop"""
+        return await asyncio.to_thread(self._run, directory_path, depth, pattern, offset, limit)
+    
+    def list_directory(self, directory_path: str, depth: int = 1, pattern: str = None) -> DirectoryListing:
+        """Entries of a directory down to `depth` levels, subdirectories and files separately"""
+        depth = max(1, depth)
+        tree = self._directory_tree
+        rel_dir = tree.relative_path(directory_path) if tree is not None else None
+        if rel_dir is not None and not tree.is_current(rel_dir, depth):
+            # Changed since the last ingest: scan it live rather than serve a stale snapshot
+            rel_dir = None
+        if rel_dir is None:
             if not os.path.exists(directory_path):
-                return f"Directory not found: {directory_path}"
+                raise FileNotFoundError(f"Directory not found: {directory_path}")
             
             if not os.path.isdir(directory_path):
-                return f"Path is not a directory: {directory_path}"
-            
-            result = f"Directory: {directory_path}\n\n"
+                raise NotADirectoryError(f"Path is not a directory: {directory_path}")
             
-            # Get all items in directory
-            items = os.listdir(directory_path)
-            
-            if not items:
-                result += "Directory is empty."
-                return result
-            
-            # Separate files and directories
-            files = []
-            directories = []
-            
-            for item in items:
-                item_path = os.path.join(directory_path, item)
-                if os.path.isdir(item_path):
-                    directories.append(item)
-                else:
-                    files.append(item)
-            
-            # Sort alphabetically
-            directories.sort()
-            files.sort()
-            
-            if directories:
-                result += f"Subdirectories ({len(directories)}):\n"
-                for dir_name in directories:
-                    result += f"  📁 {dir_name}/\n"
-                result += "\n"
-            
-            if files:
-                result += f"Files ({len(files)}):\n"
-                for file_name in files:
-                    # Add file extension indicator
-                    ext = os.path.splitext(file_name)[1]
-                    if ext in Config.SUPPORTED_EXTENSIONS:
-                        result += f"  📄 {file_name}\n"
-                    else:
-                        result += f"  📄 {file_name} (unsupported type)\n"
-            
-            return result
-            
-        except Exception as e:
-            return f"Error listing directory {directory_path}: {str(e)}" 
\ No newline at end of file
+            # Outside the snapshot or stale: scan just the requested levels, so directory totals are unknown
+            tree = DirectoryTree()
+            tree.refresh(os.path.realpath(directory_path), max_depth=depth)
+            rel_dir = ""
+        
+        directories, files = tree.walk(rel_dir, depth, pattern)
+        complete = tree is self._directory_tree
+        listing = DirectoryListing(directory_path, depth=depth, pattern=pattern)
+        listing.directories = [DirectoryEntry(path, True, size=size if complete else None,
+                                              file_count=file_count if complete else None)
+                               for path, file_count, size in directories]
+        listing.files = [DirectoryEntry(path, False, os.path.splitext(path)[1] in Config.SUPPORTED_EXTENSIONS, size)
+                         for path, size in files]
+        return listing
@@ -1,165 +1,617 @@
 import os
 import pickle
 from pathlib import Path
-from typing import List, Dict, Any
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from typing import List, Dict, Any, Iterable, Optional, Tuple
 from langchain.schema import Document
 from langchain.text_splitter import RecursiveCharacterTextSplitter
-from sentence_transformers import SentenceTransformer
 import faiss
 import numpy as np
 from chatbortai.config import Config
 import time
-import requests
-from requests.adapters import HTTPAdapter
-from urllib3.util.retry import Retry
+import uuid
+import threading
 from chatbortai.code_analysis import summarize_file, extract_functions, extract_classes
+from chatbortai.document_store import ColumnarDocumentStore
+from chatbortai.embeddings import embedding_models
+from chatbortai.query_cache import query_cache, normalize_query
+from chatbortai.lexical_index import BM25Index, reciprocal_rank_fusion
+from chatbortai.symbol_index import SymbolIndex, extract_symbols
+from chatbortai.repo_statistics import RepositoryStatistics, file_statistics
+from chatbortai.directory_tree import DirectoryTree
+from chatbortai.chunking import chunk_python_source, locate_chunks, approximate_token_count
+from chatbortai.manifest import FileManifest, hash_content, entry_matches_stat
+from chatbortai.index_factory import create_index, needs_training, set_search_parameters, faiss_metric
+
+# Zero-copy mapping of flat codes where this FAISS build supports it (mutating a mapped index aborts)
+_FAISS_MMAP_FLAGS = getattr(faiss, 'IO_FLAG_MMAP_IFC', faiss.IO_FLAG_MMAP) | faiss.IO_FLAG_READ_ONLY
 
 class CodeVectorStore:
     """Vector store for code repository embeddings"""
     
     def __init__(self, embedding_model_name: str = None):
         self.embedding_model_name = embedding_model_name or Config.EMBEDDING_MODEL
-        self.embedding_model = self._initialize_embedding_model()
-        self.documents = []
-        self.embeddings = None
+        self._embedding_model = None
+        self.documents = ColumnarDocumentStore()
         self.faiss_index = None
-        self.docstore = DocumentStore()
+        self.lexical_index = BM25Index()
+        self.symbol_index = SymbolIndex()
+        self.statistics = RepositoryStatistics()
+        self.directory_tree = DirectoryTree()
+        self.manifest = FileManifest()
+        self.ingest_stats = {}
+        self._embedding_pool = None
+        self._training_buffer = []
+        self._mmapped_index_path = None
+        # Serializes searches with updates applied from other threads (e.g. the file watcher)
+        self._lock = threading.RLock()
+        self._bump_index_version()
+    
+    def _bump_index_version(self):
+        """Give the index a new version so cached search results for the old one are never served"""
+        self.index_version = uuid.uuid4().hex
+    
+    @property
+    def embedding_model(self):
+        """Embedding model shared through the process-wide registry, loaded on first use"""
+        if self._embedding_model is None:
+            self._embedding_model = embedding_models.get(self.embedding_model_name)
+        return self._embedding_model
+    
+    @embedding_model.setter
+    def embedding_model(self, model):
+        self._embedding_model = model
+    
+    def add_documents(self, documents: List[Document]):
+        """Add documents to the vector store"""
+        self.documents.extend(documents)
+    
+    def create_embeddings(self, batch_size: int = None):
+        """Create embeddings for all documents"""
+        if not self.documents:
+            return
+        
+        batch_size = batch_size or Config.EMBEDDING_BATCH_SIZE
+        
+        # Re-embed the current documents in place (ids are positions in self.documents)
+        self.faiss_index = None
+        self._mmapped_index_path = None
+        self.lexical_index = BM25Index()
+        ids = [i for i in range(len(self.documents)) if self.documents.is_live(i)]
+        for start in range(0, len(ids), batch_size):
+            batch_ids = ids[start:start + batch_size]
+            batch = [self.documents[i] for i in batch_ids]
+            self._add_embeddings(batch, batch_ids)
+            for idx, doc in zip(batch_ids, batch):
+                self.lexical_index.add(idx, doc.page_content)
+        self._flush_training_buffer()
+    
+    def _reset_index(self):
+        """Drop all documents, embeddings and the manifest"""
+        self.documents = ColumnarDocumentStore()
+        self.faiss_index = None
+        self.lexical_index = BM25Index()
+        self.symbol_index = SymbolIndex()
+        self.statistics = RepositoryStatistics()
+        self.directory_tree = DirectoryTree()
+        self.manifest = FileManifest()
+        self._training_buffer = []
+        self._mmapped_index_path = None
+        self._bump_index_version()
+    
+    def embed_documents(self, documents: List[Document]) -> List[int]:
+        """Embed documents, append them to the index and return their ids"""
+        ids = self._append_documents(documents)
+        self._flush_training_buffer()
+        return ids
+    
+    def _append_documents(self, documents: List[Document]) -> List[int]:
+        """Embed documents as part of a stream (they may wait in the training buffer)"""
+        if not documents:
+            return []
+        
+        start = len(self.documents)
+        ids = list(range(start, start + len(documents)))
+        self._add_embeddings(documents, ids)
+        
+        self.documents.extend(documents)
+        for idx, doc in zip(ids, documents):
+            self.lexical_index.add(idx, doc.page_content)
+        
+        return ids
     
-    def _initialize_embedding_model(self):
-        """Initialize embedding model with retry logic and timeout handling"""
-        max_retries = 3
-        retry_delay = 5
+    def _add_embeddings(self, documents: List[Document], ids: List[int]):
+        """Encode one batch of documents and add it to the FAISS index"""
+        embeddings = self._encode([doc.page_content for doc in documents])
+        ids = np.array(ids, dtype='int64')
         
-        for attempt in range(max_retries):
+        # IVF indexes are trained on the first FAISS_TRAIN_SIZE embeddings of the stream
+        if self.faiss_index is None and needs_training():
+            self._training_buffer.append((embeddings, ids))
+            if sum(len(batch_ids) for _, batch_ids in self._training_buffer) >= Config.FAISS_TRAIN_SIZE:
+                self._flush_training_buffer()
+            return
+        
+        if self.faiss_index is None:
+            self.faiss_index = create_index(embeddings.shape[1])
+        
+        self._ensure_writable_index()
+        self.faiss_index.add_with_ids(embeddings, ids)
+        self._bump_index_version()
+    
+    def _encode(self, texts: List[str]) -> np.ndarray:
+        """Encode texts, L2-normalizing them when the store uses cosine similarity"""
+        if self._embedding_pool is not None:
+            # encode_multi_process returns embeddings in input order
+            embeddings = self.embedding_model.encode_multi_process(
+                texts, self._embedding_pool, batch_size=Config.EMBEDDING_BATCH_SIZE
+            )
+        else:
+            embeddings = self.embedding_model.encode(texts, batch_size=len(texts))
+        
+        embeddings = np.ascontiguousarray(embeddings, dtype='float32')
+        if self.uses_cosine:
+            faiss.normalize_L2(embeddings)
+        return embeddings
+    
+    @property
+    def uses_cosine(self) -> bool:
+        """Whether scores are cosine similarities (inner product over normalized vectors)"""
+        if self.faiss_index is not None:
+            # A loaded index keeps the metric it was built with
+            return self.faiss_index.metric_type == faiss.METRIC_INNER_PRODUCT
+        return faiss_metric() == faiss.METRIC_INNER_PRODUCT
+    
+    def _flush_training_buffer(self):
+        """Train the index on buffered embeddings and add them"""
+        if not self._training_buffer:
+            return
+        
+        embeddings = np.vstack([batch for batch, _ in self._training_buffer])
+        ids = np.concatenate([batch_ids for _, batch_ids in self._training_buffer])
+        self._training_buffer = []
+        
+        if self.faiss_index is None:
+            self.faiss_index = create_index(embeddings.shape[1],
+                                            training_vectors=embeddings[:Config.FAISS_TRAIN_SIZE])
+        self._ensure_writable_index()
+        self.faiss_index.add_with_ids(embeddings, ids)
+        self._bump_index_version()
+    
+    def _start_embedding_pool(self, workers: int):
+        """Start a sentence-transformers worker pool, one model copy per process"""
+        if workers <= 1 or not hasattr(self.embedding_model, 'start_multi_process_pool'):
+            return None
+        
+        try:
+            print(f"Starting {workers} embedding worker processes")
+            return self.embedding_model.start_multi_process_pool(['cpu'] * workers)
+        except Exception as e:
+            print(f"Could not start embedding worker pool, embedding in-process: {e}")
+            return None
+    
+    def add_document_stream(self, documents: Iterable[Document], batch_size: int = None,
+                            workers: int = None) -> Dict[str, float]:
+        """Embed a stream of documents batch by batch so memory stays flat"""
+        batch_size = batch_size or Config.EMBEDDING_BATCH_SIZE
+        workers = workers or Config.EMBEDDING_WORKERS
+        stats = {'chunks': 0, 'tokens': 0, 'seconds': 0.0, 'workers': 1}
+        start_time = time.perf_counter()
+        
+        # With workers, hand each pool call enough chunks to keep every process busy
+        group_size = batch_size * workers if workers > 1 else batch_size
+        
+        try:
+            batch = []
+            for doc in documents:
+                batch.append(doc)
+                if len(batch) >= group_size:
+                    # Only pay the pool start-up cost once the stream is big enough to need it
+                    if self._embedding_pool is None and workers > 1:
+                        self._embedding_pool = self._start_embedding_pool(workers)
+                        if self._embedding_pool is not None:
+                            stats['workers'] = workers
+                    self._embed_batch(batch, stats)
+                    batch = []
+            if batch:
+                self._embed_batch(batch, stats)
+            self._flush_training_buffer()
+        finally:
+            if self._embedding_pool is not None:
+                self.embedding_model.stop_multi_process_pool(self._embedding_pool)
+                self._embedding_pool = None
+        
+        stats['seconds'] = time.perf_counter() - start_time
+        stats['chunks_per_sec'] = stats['chunks'] / stats['seconds'] if stats['seconds'] > 0 else 0.0
+        stats['tokens_per_sec'] = stats['tokens'] / stats['seconds'] if stats['seconds'] > 0 else 0.0
+        self.ingest_stats = stats
+        
+        if stats['chunks']:
+            print(f"Embedded {stats['chunks']} chunks in {stats['seconds']:.1f}s with {stats['workers']} worker(s) "
+                  f"({stats['chunks_per_sec']:.1f} chunks/s, {stats['tokens_per_sec']:.0f} tokens/s)")
+        
+        return stats
+    
+    def _embed_batch(self, batch: List[Document], stats: Dict[str, float]):
+        """Embed one batch from a document stream and update throughput counters"""
+        self._append_documents(batch)
+        stats['chunks'] += len(batch)
+        stats['tokens'] += sum(approximate_token_count(doc.page_content) for doc in batch)
+    
+    def remove_documents(self, ids: List[int]):
+        """Tombstone documents so they are never returned by searches"""
+        if not ids:
+            return
+        
+        for idx in ids:
+            self.documents.delete(idx)
+            self.lexical_index.remove(idx)
+        self._bump_index_version()
+        
+        if self.faiss_index is not None:
+            self._ensure_writable_index()
             try:
-                # Configure requests session with longer timeout and retry strategy
-                session = requests.Session()
-                retry_strategy = Retry(
-                    total=3,
-                    backoff_factor=1,
-                    status_forcelist=[429, 500, 502, 503, 504],
-                )
-                adapter = HTTPAdapter(max_retries=retry_strategy)
-                session.mount("http://", adapter)
-                session.mount("https://", adapter)
+                self.faiss_index.remove_ids(np.array(ids, dtype='int64'))
+            except RuntimeError:
+                # HNSW cannot delete vectors; the tombstones keep them out of results
+                pass
+    
+    def _current_entry(self, file_path: str) -> Optional[Dict[str, Any]]:
+        """Manifest entry of an indexed file, or None if it is not indexed or changed since it was"""
+        if not self.manifest.repo_root:
+            return None
+        
+        path = Path(file_path).resolve()
+        try:
+            entry = self.manifest.get(path.relative_to(self.manifest.repo_root).as_posix())
+            if entry is None or not entry_matches_stat(entry, path.stat()):
+                return None
+        except (ValueError, OSError):
+            return None
+        return entry
+    
+    def is_file_current(self, file_path: str) -> bool:
+        """Whether what was derived from a file at ingest time (chunks, symbols) still matches it on disk"""
+        return self._current_entry(file_path) is not None
+    
+    def line_offset(self, file_path: str, line: int) -> Tuple[int, int]:
+        """(line, byte offset) of the closest chunk start at or before `line` in an indexed file.
+        
+        Returns (1, 0) when the file is not indexed or changed since it was, so readers can
+        always fall back to scanning from the top.
+        """
+        best = (1, 0)
+        entry = self._current_entry(file_path)
+        if entry is None:
+            return best
+        
+        for idx in entry['chunk_ids']:
+            positions = self.documents.positions(idx)
+            if positions is None or positions['start_byte'] < 0:
+                continue
+            if best[0] < positions['start_line'] <= line:
+                best = (positions['start_line'], positions['start_byte'])
+        return best
+    
+    @property
+    def document_count(self) -> int:
+        """Number of live (non-tombstoned) documents"""
+        return self.documents.live_count
+    
+    def refresh(self, repo_path: str, processor: "CodeProcessor" = None,
+                paths: Iterable[str] = None) -> Dict[str, int]:
+        """Re-chunk and re-embed only files that changed since the last refresh.
+        
+        `paths` (relative to the repository, files or directories) limits the check to
+        those paths, as reported by a file watcher; searches wait while an update runs.
+        """
+        with self._lock:
+            return self._refresh(repo_path, processor or CodeProcessor(), paths)
+    
+    def _refresh(self, repo_path: str, processor: "CodeProcessor", paths: Iterable[str] = None) -> Dict[str, int]:
+        repo_root = Path(repo_path).resolve()
+        report = {'skipped': 0, 'updated': 0, 'added': 0, 'removed': 0, 'backfilled': 0}
+        
+        # Stores built before manifests existed cannot be diffed; start over
+        if self.documents and not self.manifest.files:
+            self._reset_index()
+            paths = None
+        self.manifest.repo_root = str(repo_root)
+        
+        # One scandir pass over changed directories (all of them on the first run) lists the repository
+        self.directory_tree.refresh(str(repo_root))
+        current_files = {}
+        for rel_path, _ in self.directory_tree.files():
+            if os.path.splitext(rel_path)[1] in Config.SUPPORTED_EXTENSIONS:
+                current_files[rel_path] = repo_root / rel_path
+        removed_files = self.manifest.removed_files(current_files)
+        
+        if paths is not None:
+            # Only look at the given files and at files below the given directories
+            paths = set(paths)
+            prefixes = tuple(f"{path}/" for path in paths)
+            def in_scope(rel_path: str) -> bool:
+                return rel_path in paths or rel_path.startswith(prefixes)
+            current_files = {rel_path: file_path for rel_path, file_path in current_files.items() if in_scope(rel_path)}
+            removed_files = [rel_path for rel_path in removed_files if in_scope(rel_path)]
+        
+        # Tombstone chunks of deleted files
+        for rel_path in removed_files:
+            entry = self.manifest.remove(rel_path)
+            self.remove_documents(entry['chunk_ids'])
+            self.symbol_index.remove_file(str(repo_root / rel_path))
+            self.statistics.remove_file(rel_path)
+            report['removed'] += 1
+        
+        # Stream documents of added/modified files into the batched embedding pipeline.
+        # Files are read and split in parallel but consumed in order, and ids are
+        # assigned in stream order, so each file's chunk ids are known up front.
+        next_id = len(self.documents)
+        
+        def changed_documents():
+            nonlocal next_id
+            items = [(rel_path, file_path, self.manifest.get(rel_path))
+                     for rel_path, file_path in current_files.items()]
+            for result in processor.load_files(items):
+                rel_path = result['rel_path']
+                stat_result = result['stat']
+                status = result['status']
                 
-                # Try to load the model with extended timeout
-                print(f"Attempting to load embedding model: {self.embedding_model_name} (attempt {attempt + 1}/{max_retries})")
+                if status == 'error':
+                    continue
+                # Edits in place do not change the directory's mtime
+                self.directory_tree.set_file_size(rel_path, stat_result.st_size)
                 
-                # Use a simpler model as fallback if the main one fails
-                if attempt == 0:
-                    model_name = self.embedding_model_name
-                else:
-                    # Fallback to a smaller, faster model
-                    model_name = "paraphrase-MiniLM-L3-v2"
+                # Stores saved before the symbol table and statistics existed get them filled in once
+                if status in ('unchanged', 'touched'):
+                    backfilled = False
+                    if result['file_path'].suffix == '.py' and result['file_path'] not in self.symbol_index:
+                        self.symbol_index.set_file(result['file_path'], processor.extract_file_symbols(result['file_path']))
+                        backfilled = True
+                    if rel_path not in self.statistics:
+                        self.statistics.set_file(rel_path, processor.compute_file_statistics(result['file_path']))
+                        backfilled = True
+                    report['backfilled'] += backfilled
                 
-                embedding_model = SentenceTransformer(
-                    model_name,
-                    device='cpu',  # Force CPU to avoid GPU memory issues
-                    cache_folder="./model_cache"  # Cache models locally
-                )
+                if status == 'unchanged':
+                    report['skipped'] += 1
+                    continue
                 
-                print(f"Successfully loaded embedding model: {model_name}")
-                return embedding_model
+                entry = self.manifest.get(rel_path)
                 
-            except Exception as e:
-                print(f"Attempt {attempt + 1} failed: {str(e)}")
-                if attempt < max_retries - 1:
-                    print(f"Retrying in {retry_delay} seconds...")
-                    time.sleep(retry_delay)
-                    retry_delay *= 2  # Exponential backoff
-                else:
-                    print("All attempts failed. Using fallback embedding method.")
-                    # Create a simple fallback embedding model
-                    return self._create_fallback_embedding_model()
-    
-    def _create_fallback_embedding_model(self):
-        """Create a simple fallback embedding model using basic text features"""
-        class FallbackEmbeddingModel:
-            def __init__(self):
-                self.dimension = 128  # Fixed dimension for fallback
+                # Touched but identical content: only refresh size/mtime
+                if status == 'touched':
+                    self.manifest.set(rel_path, stat_result.st_size, stat_result.st_mtime_ns,
+                                      result['hash'], entry['chunk_ids'])
+                    report['skipped'] += 1
+                    continue
                 
-            def encode(self, texts, **kwargs):
-                """Simple fallback encoding using basic text features"""
-                import hashlib
-                import numpy as np
+                documents = result['documents']
+                report['updated' if entry is not None else 'added'] += 1
                 
-                embeddings = []
-                for text in texts:
-                    # Create a simple hash-based embedding
-                    text_hash = hashlib.md5(text.encode()).hexdigest()
-                    # Convert hash to numerical values
-                    embedding = np.array([ord(c) for c in text_hash[:self.dimension]], dtype=np.float32)
-                    # Normalize
-                    if np.linalg.norm(embedding) > 0:
-                        embedding = embedding / np.linalg.norm(embedding)
-                    embeddings.append(embedding)
+                if result['symbols'] is not None:
+                    self.symbol_index.set_file(result['file_path'], result['symbols'])
+                else:
+                    self.symbol_index.remove_file(result['file_path'])
+                self.statistics.set_file(rel_path, result['statistics'])
                 
-                return np.array(embeddings)
+                chunk_ids = list(range(next_id, next_id + len(documents)))
+                next_id += len(documents)
+                pending.append((rel_path, entry, stat_result, result['hash'], chunk_ids))
+                # Batches embedded since the last file can now be recorded
+                commit_embedded()
+                yield from documents
         
-        return FallbackEmbeddingModel()
-
-    def add_documents(self, documents: List[Document]):
-        """Add documents to the vector store"""
-        self.documents.extend(documents)
-    
-    def create_embeddings(self):
-        """Create embeddings for all documents"""
-        if not self.documents:
-            return
-        
-        # Extract text content
-        texts = [doc.page_content for doc in self.documents]
+        # A file's old chunks are only replaced, and its manifest entry only written, once its new
+        # chunks are embedded: if encoding fails partway, unrecorded files still differ from the
+        # manifest and are picked up again by the next refresh
+        pending = deque()
         
-        # Create embeddings
-        embeddings = self.embedding_model.encode(texts)
+        def commit_embedded():
+            while pending and (not pending[0][4] or (pending[0][4][-1] < len(self.documents)
+                                                     and not self._training_buffer)):
+                rel_path, entry, stat_result, content_hash, chunk_ids = pending.popleft()
+                if entry is not None:
+                    self.remove_documents(entry['chunk_ids'])
+                self.manifest.set(rel_path, stat_result.st_size, stat_result.st_mtime_ns, content_hash, chunk_ids)
         
-        # Create FAISS index
-        dimension = embeddings.shape[1]
-        self.faiss_index = faiss.IndexFlatL2(dimension)
-        self.faiss_index.add(embeddings.astype('float32'))
+        self.add_document_stream(changed_documents())
+        commit_embedded()
         
-        # Store embeddings
-        self.embeddings = embeddings
-        
-        # Add to document store
-        for doc in self.documents:
-            self.docstore.add_document(doc)
+        return report
     
     def similarity_search(self, query: str, k: int = 5) -> List[Document]:
         """Search for similar documents"""
+        return [doc for doc, _ in self.similarity_search_with_score(query, k)]
+    
+    def similarity_search_with_score(self, query: str, k: int = 5,
+                                     score_threshold: float = None) -> List[Tuple[Document, float]]:
+        """Search for similar documents and return (document, score) pairs, best first.
+        
+        Scores are cosine similarities for cosine stores; L2 stores return 1 / (1 + distance).
+        Hits scoring below score_threshold are dropped (cosine stores only).
+        """
+        return self.batch_similarity_search([query], k, score_threshold)[0]
+    
+    def batch_similarity_search(self, queries: List[str], k: int = 5,
+                                score_threshold: float = None) -> List[List[Tuple[Document, float]]]:
+        """Search for several queries at once and return ranked (document, score) pairs per query.
+        
+        Queries not answered from the cache are encoded in one forward pass and looked up
+        with one FAISS search over the query matrix.
+        """
+        # Cached hits hold ids only; documents are materialized per call
+        with self._lock:
+            return [[(self.documents[idx], score) for idx, score in query_hits]
+                    for query_hits in self._similarity_hits(queries, k, score_threshold)]
+    
+    def _similarity_hits(self, queries: List[str], k: int,
+                         score_threshold: float = None) -> List[List[Tuple[int, float]]]:
+        """(id, score) pairs per query, answered from the query cache where possible"""
         if self.faiss_index is None:
-            return []
+            return [[] for _ in queries]
         
-        # Encode query
-        query_embedding = self.embedding_model.encode([query])
+        # Repeated searches against an unchanged index skip encoding and FAISS entirely
+        index_version = self.index_version
+        hits = [query_cache.get_results(index_version, query, k, score_threshold) for query in queries]
+        pending = [i for i, query_hits in enumerate(hits) if query_hits is None]
         
-        # Search
-        D, I = self.faiss_index.search(query_embedding.astype('float32'), k)
+        if pending:
+            query_embeddings = self._encode_queries([queries[i] for i in pending])
+            for i, query_hits in zip(pending, self._search_ids(query_embeddings, k, score_threshold)):
+                hits[i] = query_hits
+                query_cache.put_results(index_version, queries[i], k, score_threshold, query_hits)
         
-        # Return documents
-        results = []
-        for idx in I[0]:
-            if idx < len(self.documents):
-                results.append(self.documents[idx])
+        return hits
+    
+    def lexical_search(self, query: str, k: int = 5) -> List[Tuple[Document, float]]:
+        """BM25 keyword search over code tokens (identifiers are split on camelCase/snake_case)"""
+        with self._lock:
+            return [(self.documents[idx], score) for idx, score in self.lexical_index.search(query, k)]
+    
+    def hybrid_search(self, query: str, k: int = 5,
+                      score_threshold: float = None) -> List[Tuple[Document, float]]:
+        """Fuse BM25 and vector hits with reciprocal rank fusion; scores are fused RRF scores.
+        
+        score_threshold filters the vector hits only, so exact identifier matches always count.
+        """
+        candidates = k * 4
+        with self._lock:
+            semantic = [idx for idx, _ in self._similarity_hits([query], candidates, score_threshold)[0]]
+            lexical = [idx for idx, _ in self.lexical_index.search(query, candidates)]
+            fused = reciprocal_rank_fusion([semantic, lexical])[:k]
+            return [(self.documents[idx], score) for idx, score in fused]
+    
+    def _encode_queries(self, queries: List[str]) -> np.ndarray:
+        """Encode queries, reusing embeddings of earlier identical (normalized) queries"""
+        # Keyed by the model actually loaded: a fallback's embeddings never reach a store built with another model
+        cache_key = f"{embedding_models.signature(self.embedding_model)}:{'cosine' if self.uses_cosine else 'l2'}"
+        embeddings = [query_cache.get_embedding(cache_key, query) for query in queries]
+        
+        # Encode the remaining distinct (normalized) queries in a single batch
+        missing = {}
+        for query, embedding in zip(queries, embeddings):
+            if embedding is None:
+                missing.setdefault(normalize_query(query), query)
+        if missing:
+            encoded = dict(zip(missing, self._encode(list(missing.values()))))
+            for key, embedding in encoded.items():
+                embedding.flags.writeable = False
+                query_cache.put_embedding(cache_key, missing[key], embedding)
+            embeddings = [embedding if embedding is not None else encoded[normalize_query(query)]
+                          for query, embedding in zip(queries, embeddings)]
+        
+        return np.ascontiguousarray(np.vstack(embeddings), dtype='float32')
+    
+    def _search_ids(self, query_embeddings: np.ndarray, k: int,
+                    score_threshold: float = None) -> List[List[Tuple[int, float]]]:
+        """Search the index for a matrix of query embeddings and return (id, score) pairs of live documents per row.
+        
+        Tombstoned vectors (HNSW cannot remove any) still come back from FAISS, so rows short of
+        k live hits are searched again with a doubled fetch until the index is exhausted.
+        """
+        set_search_parameters(self.faiss_index)
+        ntotal = self.faiss_index.ntotal
+        results = [[] for _ in range(len(query_embeddings))]
+        pending = list(range(len(query_embeddings))) if ntotal else []
+        fetch = k * 2
+        while pending:
+            D, I = self.faiss_index.search(query_embeddings[pending], min(fetch, ntotal))
+            
+            widen = []
+            for row, distances, ids in zip(pending, D, I):
+                hits = []
+                below_threshold = False
+                for distance, idx in zip(distances, ids):
+                    if not self.documents.is_live(int(idx)):
+                        continue
+                    
+                    if self.uses_cosine:
+                        score = float(distance)
+                        if score_threshold is not None and score < score_threshold:
+                            # Results are sorted, so a wider fetch only adds weaker hits
+                            below_threshold = True
+                            break
+                    else:
+                        score = 1.0 / (1.0 + float(distance))
+                    
+                    hits.append((int(idx), score))
+                    if len(hits) == k:
+                        break
+                results[row] = hits
+                if len(hits) < k and not below_threshold and fetch < ntotal:
+                    widen.append(row)
+            pending = widen
+            fetch *= 2
         
         return results
     
     def save(self, path: str):
-        """Save vector store to disk"""
+        """Save vector store to disk; searches and refreshes wait while the files and mappings are swapped"""
+        with self._lock:
+            self._save(path)
+    
+    def _save(self, path: str):
         os.makedirs(path, exist_ok=True)
         
-        # Save FAISS index
+        # Save FAISS index (via a temp file so processes mapping the old one keep a valid view)
         if self.faiss_index is not None:
-            faiss.write_index(self.faiss_index, os.path.join(path, "faiss_index.bin"))
+            faiss_path = os.path.join(path, "faiss_index.bin")
+            faiss.write_index(self.faiss_index, faiss_path + ".tmp")
+            os.replace(faiss_path + ".tmp", faiss_path)
+            if Config.FAISS_MMAP:
+                # Serve from the shared page cache instead of a private in-memory copy
+                self.faiss_index = self._read_index(faiss_path)
+        
+        # Save documents and metadata in the columnar format
+        self.documents.save(path)
         
-        # Save documents and metadata
-        with open(os.path.join(path, "documents.pkl"), "wb") as f:
-            pickle.dump(self.documents, f)
+        # Drop the pickle written by older versions
+        legacy_docs_path = os.path.join(path, "documents.pkl")
+        if os.path.exists(legacy_docs_path):
+            os.remove(legacy_docs_path)
         
         # Save embedding model info
         with open(os.path.join(path, "model_info.txt"), "w") as f:
             f.write(self.embedding_model_name)
+        
+        # Save BM25 index used for keyword and hybrid search
+        self.lexical_index.save(path)
+        
+        # Save symbol table used for definition lookups
+        self.symbol_index.save(path)
+        
+        # Save per-file counts and the repository summary
+        self.statistics.save(path)
+        
+        # Save directory snapshot (refreshed by mtime on the next run)
+        self.directory_tree.save(path)
+        
+        # Save per-file manifest used for incremental refreshes
+        self.manifest.save(path)
+    
+    def _read_index(self, faiss_path: str):
+        """Read a FAISS index, memory-mapping it read-only when FAISS_MMAP is enabled"""
+        self._mmapped_index_path = None
+        if Config.FAISS_MMAP:
+            try:
+                index = faiss.read_index(faiss_path, _FAISS_MMAP_FLAGS)
+                self._mmapped_index_path = faiss_path
+                return index
+            except RuntimeError as e:
+                print(f"Could not memory-map {faiss_path}, reading it into memory: {e}")
+        return faiss.read_index(faiss_path)
+    
+    def _ensure_writable_index(self):
+        """Swap a read-only memory-mapped index for an in-memory copy before mutating it.
+        
+        The copy is made from the mapping itself: another process may already have
+        replaced the file with an index that does not match this store's documents.
+        """
+        if self._mmapped_index_path is not None:
+            self.faiss_index = faiss.deserialize_index(faiss.serialize_index(self.faiss_index))
+            self._mmapped_index_path = None
     
     def load(self, path: str):
         """Load vector store from disk"""
@@ -169,40 +621,55 @@ class CodeVectorStore:
         # Load FAISS index
         faiss_path = os.path.join(path, "faiss_index.bin")
         if os.path.exists(faiss_path):
-            self.faiss_index = faiss.read_index(faiss_path)
+            self.faiss_index = self._read_index(faiss_path)
         
-        # Load documents
+        # Load documents (memory-mapped; older stores pickled every Document)
         docs_path = os.path.join(path, "documents.pkl")
-        if os.path.exists(docs_path):
+        if ColumnarDocumentStore.exists(path):
+            self.documents = ColumnarDocumentStore.load(path)
+        elif os.path.exists(docs_path):
             with open(docs_path, "rb") as f:
-                self.documents = pickle.load(f)
+                self.documents = ColumnarDocumentStore()
+                for doc in pickle.load(f):
+                    idx = self.documents.append(doc if doc is not None else Document(page_content=""))
+                    if doc is None:
+                        self.documents.delete(idx)
         
         # Load embedding model info
         model_info_path = os.path.join(path, "model_info.txt")
         if os.path.exists(model_info_path):
             with open(model_info_path, "r") as f:
-                self.embedding_model_name = f.read().strip()
-                self.embedding_model = self._initialize_embedding_model() # Re-initialize with loaded name
+                model_name = f.read().strip()
+                if model_name != self.embedding_model_name:
+                    self.embedding_model_name = model_name
+                    self._embedding_model = None
+        
+        # Load BM25 index (rebuilt once for stores saved before it existed or in the old JSON format)
+        self.lexical_index = BM25Index.load(path)
+        if self.lexical_index is None:
+            self.lexical_index = BM25Index()
+            if self.documents.live_count:
+                print(f"Building keyword index for {self.documents.live_count} chunks")
+                for idx in range(len(self.documents)):
+                    doc = self.documents[idx]
+                    if doc is not None:
+                        self.lexical_index.add(idx, doc.page_content)
+        
+        # Load symbol table (filled in by the next refresh for stores saved before it existed)
+        self.symbol_index = SymbolIndex.load(path) or SymbolIndex()
         
-        # Recreate document store
-        self.docstore = DocumentStore()
-        for doc in self.documents:
-            self.docstore.add_document(doc)
+        # Load repository statistics (likewise filled in by the next refresh)
+        self.statistics = RepositoryStatistics.load(path) or RepositoryStatistics()
         
+        # Load directory snapshot (built by the next refresh if missing)
+        self.directory_tree = DirectoryTree.load(path) or DirectoryTree()
+        
+        # Load manifest (stores saved before manifests existed have none)
+        self.manifest = FileManifest.load(path) or FileManifest()
+        
+        self._bump_index_version()
         return True
 
-class DocumentStore:
-    """Simple document store for metadata"""
-    
-    def __init__(self):
-        self._dict = {}
-        self._counter = 0
-    
-    def add_document(self, document: Document):
-        """Add a document to the store"""
-        self._dict[self._counter] = document
-        self._counter += 1
-
 class CodeProcessor:
     """Process code files and create documents for vector store"""
     
@@ -222,65 +689,171 @@ class CodeProcessor:
             return documents
         
         # Walk through all files
-        for file_path in repo_path.rglob("*"):
-            if file_path.is_file() and self._should_process_file(file_path):
-                file_docs = self.process_file(file_path)
-                documents.extend(file_docs)
+        documents.extend(self.iter_documents(repo_path))
         
         return documents
     
-    def process_file(self, file_path: Path) -> List[Document]:
-        """Process a single file and return documents"""
+    def iter_documents(self, repo_path: str) -> Iterable[Document]:
+        """Yield documents file by file instead of building one big list"""
+        repo_path = Path(repo_path)
+        items = ((file_path.relative_to(repo_path).as_posix(), file_path, None)
+                 for file_path in self.iter_repository_files(repo_path))
+        for result in self.load_files(items):
+            yield from result['documents']
+    
+    def iter_repository_files(self, repo_path: Path):
+        """Yield every file in the repository that should be indexed"""
+        repo_path = Path(repo_path)
+        if not repo_path.exists():
+            return
+        
+        # Prune hidden and ignored directories so the walk never descends into them
+        for root, dirnames, filenames in os.walk(repo_path):
+            dirnames[:] = sorted(d for d in dirnames
+                                 if not d.startswith('.') and d not in Config.IGNORED_DIRECTORIES)
+            for filename in sorted(filenames):
+                if filename.startswith('.') or os.path.splitext(filename)[1] not in Config.SUPPORTED_EXTENSIONS:
+                    continue
+                file_path = Path(root, filename)
+                if os.path.isfile(file_path):
+                    yield file_path
+    
+    def load_files(self, items, workers: int = None):
+        """Read, hash and split files in a pool, yielding results in input order"""
+        workers = workers or Config.INGEST_WORKERS
+        if workers <= 1:
+            for item in items:
+                yield self.load_file(*item)
+            return
+        
+        if Config.INGEST_EXECUTOR == "process":
+            # Splitting is pure Python, so processes sidestep the GIL at the cost of pickling results
+            executor = ProcessPoolExecutor(workers, initializer=_init_ingest_worker, initargs=(self,))
+            load = _load_file_in_worker
+        else:
+            executor = ThreadPoolExecutor(workers)
+            load = self._load_item
+        
+        # Keep a bounded window of in-flight files so memory does not grow with the repository
+        window = workers * 4
+        with executor:
+            pending = deque()
+            for item in items:
+                pending.append(executor.submit(load, item))
+                if len(pending) >= window:
+                    yield pending.popleft().result()
+            while pending:
+                yield pending.popleft().result()
+    
+    def _load_item(self, item) -> Dict[str, Any]:
+        return self.load_file(*item)
+    
+    def load_file(self, rel_path: str, file_path: Path, entry: Dict[str, Any] = None) -> Dict[str, Any]:
+        """Stat, hash and split one file, comparing it with its manifest entry"""
+        result = {'rel_path': rel_path, 'file_path': file_path, 'stat': None,
+                  'status': 'error', 'hash': None, 'documents': [], 'symbols': None, 'statistics': None}
         try:
-            # Check file size
-            if file_path.stat().st_size > Config.MAX_FILE_SIZE:
-                return []
+            stat_result = file_path.stat()
+            result['stat'] = stat_result
             
-            # Read file content
-            with open(file_path, 'r', encoding='utf-8', errors='ignore') as f:
-                content = f.read()
+            if entry_matches_stat(entry, stat_result):
+                result['status'] = 'unchanged'
+                return result
             
-            # Skip empty files
-            if not content.strip():
-                return []
+            # Oversized files are recorded without being read
+            if stat_result.st_size > Config.MAX_FILE_SIZE:
+                result['statistics'] = file_statistics(str(file_path), stat_result.st_size)
+                result['status'] = 'changed'
+                return result
             
-            # Split content into chunks
-            chunks = self.text_splitter.split_text(content)
+            data = file_path.read_bytes()
+            result['hash'] = hash_content(data)
             
-            # Create documents
-            documents = []
-            for i, chunk in enumerate(chunks):
-                doc = Document(
-                    page_content=chunk,
-                    metadata={
-                        'file_path': str(file_path),
-                        'file_name': file_path.name,
-                        'file_extension': file_path.suffix,
-                        'chunk_index': i,
-                        'total_chunks': len(chunks)
-                    }
-                )
-                documents.append(doc)
-            
-            return documents
+            if entry is not None and entry['hash'] == result['hash']:
+                result['status'] = 'touched'
+                return result
             
+            content = data.decode('utf-8', errors='ignore')
+            # Byte offsets are into the decoded text, so they only match the file if nothing was dropped
+            exact = len(content.encode('utf-8')) == len(data)
+            result['documents'] = self.split_content(file_path, content, byte_offsets=exact)
+            # Symbols are returned rather than indexed here, since this may run in a worker process
+            if file_path.suffix == '.py':
+                result['symbols'] = self.extract_file_symbols(file_path, content)
+            result['statistics'] = file_statistics(str(file_path), stat_result.st_size, content, result['symbols'])
+            result['status'] = 'changed'
         except Exception as e:
             print(f"Error processing file {file_path}: {e}")
-            return []
+        
+        return result
     
-    def _should_process_file(self, file_path: Path) -> bool:
-        """Check if file should be processed"""
-        # Check extension
-        if file_path.suffix not in Config.SUPPORTED_EXTENSIONS:
-            return False
+    def extract_file_symbols(self, file_path: Path, content: str = None) -> Dict[str, Any]:
+        """Symbol table entry for a Python file (empty if it does not parse)"""
+        try:
+            if content is None:
+                content = file_path.read_text(encoding='utf-8', errors='ignore')
+            return extract_symbols(content, str(file_path))
+        except (SyntaxError, ValueError, OSError) as e:
+            print(f"Could not extract symbols from {file_path}: {e}")
+            return {'symbols': [], 'imports': []}
+    
+    def compute_file_statistics(self, file_path: Path) -> Dict[str, Any]:
+        """Statistics entry for a file, reading it unless it is too large to index"""
+        size = file_path.stat().st_size
+        if size > Config.MAX_FILE_SIZE:
+            return file_statistics(str(file_path), size)
+        content = file_path.read_text(encoding='utf-8', errors='ignore')
+        symbols = self.extract_file_symbols(file_path, content) if file_path.suffix == '.py' else None
+        return file_statistics(str(file_path), size, content, symbols)
+    
+    def split_content(self, file_path: Path, content: str, byte_offsets: bool = True) -> List[Document]:
+        """Split already-read file content into documents.
         
-        # Skip hidden files and directories
-        if any(part.startswith('.') for part in file_path.parts):
-            return False
+        byte_offsets=False records no byte range (readers then scan from the top of the file),
+        for content that does not encode back to the file's bytes.
+        """
+        # Skip empty files
+        if not content.strip():
+            return []
         
-        # Skip common directories to ignore
-        ignore_dirs = {'.git', '__pycache__', 'node_modules', '.venv', 'venv', 'env'}
-        if any(part in ignore_dirs for part in file_path.parts):
-            return False
+        # Python files are split along definitions; anything else (or unparsable) by size
+        chunks = None
+        if Config.AST_CHUNKING and file_path.suffix == '.py':
+            python_chunks = chunk_python_source(content, Config.CHUNK_SIZE)
+            if python_chunks is not None:
+                chunks = [chunk for chunk, _, _ in python_chunks]
+        if chunks is None:
+            chunks = self.text_splitter.split_text(content)
+        
+        # Create documents, recording where each chunk sits in the file
+        documents = []
+        for i, (chunk, (start_line, end_line, start_byte, end_byte)) in enumerate(zip(chunks, locate_chunks(content, chunks))):
+            if not byte_offsets:
+                start_byte = end_byte = -1
+            doc = Document(
+                page_content=chunk,
+                metadata={
+                    'file_path': str(file_path),
+                    'file_name': file_path.name,
+                    'file_extension': file_path.suffix,
+                    'chunk_index': i,
+                    'total_chunks': len(chunks),
+                    'start_line': start_line,
+                    'end_line': end_line,
+                    'start_byte': start_byte,
+                    'end_byte': end_byte
+                }
+            )
+            documents.append(doc)
         
-        return True 
\ No newline at end of file
+        return documents
+
+# Per-process processor used by the process-pool variant of CodeProcessor.load_files
+_worker_processor = None
+
+def _init_ingest_worker(processor: CodeProcessor):
+    global _worker_processor
+    _worker_processor = processor
+
+def _load_file_in_worker(item) -> Dict[str, Any]:
+    return _worker_processor.load_file(*item) 
\ No newline at end of file